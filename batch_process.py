@@ -0,0 +1,168 @@
+"""Processamento em lote de imagens pela linha de comando
+
+Aplica uma cadeia de operações a todas as imagens de um diretório (incluindo
+subdiretórios), distribuindo o trabalho em um pool de processos e gravando os
+resultados em um diretório de saída com a mesma estrutura.
+
+Exemplo:
+    python batch_process.py entrada/ saida/ --ops grayscale,median,binary --analyses metrics,count
+
+Este módulo não importa a interface gráfica (tkinter/pygame), podendo rodar
+em máquinas sem display.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+import image_operations as ops
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif")
+
+
+def find_images(input_dir):
+    """Percorre o diretório de entrada e retorna os caminhos relativos das imagens"""
+    for dirpath, _, filenames in os.walk(input_dir):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(dirpath, filename), input_dir)
+
+
+def init_worker():
+    """Inicializa cada processo do pool"""
+    # Cada processo usa uma única thread do OpenCV para não disputar núcleos
+    cv2.setNumThreads(1)
+
+
+def process_file(input_dir, output_dir, relative_path, operations, analyses, output_format):
+    """Processa um arquivo; executado dentro dos processos do pool
+
+    Falhas (imagem ilegível, erro do OpenCV em uma operação, etc.) viram um
+    status "erro: ..." no resultado, sem interromper o lote.
+    """
+    start = time.perf_counter()
+    result = {"file": relative_path, "status": "ok"}
+    try:
+        _process_image(input_dir, output_dir, relative_path, operations, analyses, output_format, result)
+    except Exception as e:
+        result["status"] = f"erro: {type(e).__name__}: {e}".strip()
+    result["time_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def _process_image(input_dir, output_dir, relative_path, operations, analyses, output_format, result):
+    """Lê, processa, analisa e grava uma imagem, preenchendo result"""
+    image = cv2.imread(os.path.join(input_dir, relative_path))
+    if image is None:
+        result["status"] = "erro: não foi possível ler a imagem"
+        return
+
+    image = ops.apply_operations(image, operations)
+
+    # Análises (métricas/contagem) são feitas sobre o resultado da cadeia
+    for name in analyses:
+        value = ops.ANALYSES[name](image)
+        if isinstance(value, dict):
+            result.update(value)
+        else:
+            result[name] = value
+
+    if operations:
+        output_path = os.path.join(output_dir, relative_path)
+        if output_format:
+            output_path = os.path.splitext(output_path)[0] + "." + output_format
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if not cv2.imwrite(output_path, image):
+            result["status"] = "erro: não foi possível salvar a imagem"
+
+
+def parse_names(value, available, kind):
+    """Converte 'a,b,c' em lista validando contra os nomes disponíveis"""
+    names = [name.strip() for name in value.split(",") if name.strip()] if value else []
+    for name in names:
+        if name not in available:
+            raise argparse.ArgumentTypeError(
+                f"{kind} desconhecida: {name} (disponíveis: {', '.join(available)})")
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processamento de imagens em lote")
+    parser.add_argument("input_dir", help="Diretório com as imagens de entrada")
+    parser.add_argument("output_dir", help="Diretório onde os resultados serão gravados")
+    parser.add_argument("--ops", default="",
+                        help=f"Cadeia de operações separadas por vírgula ({', '.join(ops.OPERATIONS)})")
+    parser.add_argument("--analyses", default="",
+                        help=f"Análises a executar no resultado ({', '.join(ops.ANALYSES)})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Número de processos (padrão: número de núcleos)")
+    parser.add_argument("--format", default=None,
+                        help="Extensão de saída (ex.: png); padrão mantém a original")
+    parser.add_argument("--report", default=None,
+                        help="Arquivo CSV com tempo e resultados por imagem")
+    args = parser.parse_args(argv)
+
+    try:
+        operations = parse_names(args.ops, ops.OPERATIONS, "Operação")
+        analyses = parse_names(args.analyses, ops.ANALYSES, "Análise")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    if not operations and not analyses:
+        parser.error("Informe ao menos uma operação (--ops) ou análise (--analyses)")
+
+    files = list(find_images(args.input_dir))
+    if not files:
+        print(f"Nenhuma imagem encontrada em {args.input_dir}")
+        return 1
+
+    print(f"Processando {len(files)} imagens com {args.workers} processos...")
+    results = []
+    failed = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        futures = {executor.submit(process_file, args.input_dir, args.output_dir, path,
+                                   operations, analyses, args.format): path
+                   for path in files}
+
+        # Resultados são reportados à medida que ficam prontos
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Falha fora de process_file (ex.: processo do pool encerrado)
+                result = {"file": futures[future], "status": f"erro: {type(e).__name__}: {e}".strip(),
+                          "time_ms": 0.0}
+            results.append(result)
+            if result["status"] != "ok":
+                failed.append(result)
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{len(files)}] {result['file']} - {result['time_ms']:.1f} ms - "
+                  f"{result['status']} - {done / elapsed:.1f} imagens/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"Concluído: {len(results)} imagens em {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} imagens/s), {len(failed)} erro(s)")
+    for result in sorted(failed, key=lambda r: r["file"]):
+        print(f"  {result['file']}: {result['status']}")
+
+    if args.report:
+        fieldnames = []
+        for result in results:
+            fieldnames.extend(key for key in result if key not in fieldnames)
+        with open(args.report, "w", newline="", encoding="utf-8") as report_file:
+            writer = csv.DictWriter(report_file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(sorted(results, key=lambda r: r["file"]))
+        print(f"Relatório salvo em: {args.report}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Benchmark das operações de imagem e vídeo
+
+Gera frames sintéticos (determinísticos) em várias resoluções e mede o tempo
+de cada operação da aba de imagem, da cadeia de vídeo
+(apply_operation_to_frame), das análises (contagem e métricas), da
+segmentação de vermelho e do casamento ORB do detector de microfone. Os
+resultados (percentis em ms e memória alocada por chamada) são gravados em
+JSON; com --compare, cada caso é comparado com um resultado anterior para
+evidenciar regressões entre versões.
+
+Com --kernel-scaling, os filtros de vizinhança também são medidos com
+kernels de 5x5 a 31x31 em uma única chamada do OpenCV e em faixas paralelas
+(tiled.apply_in_strips), mostrando o ganho (ou a perda) da execução em
+faixas. Para faixas em paralelo sem disputar núcleos com o OpenCV, limite as
+threads dele (ex.: --threads 1 --workers 8).
+
+Exemplo:
+    python benchmark.py --resolutions vga,720p --repeats 30 --output bench.json
+    python benchmark.py --output novo.json --compare bench.json
+    python benchmark.py --resolutions 4k --cases none --kernel-scaling --repeats 5
+
+Não importa a interface gráfica.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import image_operations as ops
+from detectors import (MAX_MATCH_DISTANCE, MicrophoneDetector, RedColorSegmenter, RoiScorer,
+                       load_template_descriptors)
+from tiled import NEIGHBORHOOD_OPERATIONS, apply_in_strips, strip_workers
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Variação relativa da mediana a partir da qual --compare aponta regressão
+REGRESSION_THRESHOLD = 0.10
+
+# Kernels medidos por --kernel-scaling
+KERNEL_SIZES = (5, 9, 15, 21, 31)
+
+
+def synthetic_frame(width, height, seed=0):
+    """Frame BGR determinístico com gradiente, ruído e formas (incluindo vermelhas)"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[..., 0] = (x * 0.6 + y * 0.2).astype(np.uint8)
+    frame[..., 1] = (x * 0.2 + y * 0.6).astype(np.uint8)
+    frame[..., 2] = ((x + y) * 0.3).astype(np.uint8)
+
+    # Formas espalhadas: dão trabalho à contagem, às métricas e ao detector
+    scale = width / 640
+    for _ in range(40):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(5, 40) * scale)
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(frame, center, radius, color, -1)
+    for _ in range(8):
+        x0, y0 = int(rng.integers(0, width - 100 * scale)), int(rng.integers(0, height - 100 * scale))
+        w, h = int(rng.integers(30, 100) * scale), int(rng.integers(30, 100) * scale)
+        cv2.rectangle(frame, (x0, y0), (x0 + w, y0 + h), (20, 20, 220), -1)
+
+    noise = rng.integers(-12, 13, frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def time_case(function, argument, repeats, warmup):
+    """Executa function(argument) e retorna a lista de tempos em ms"""
+    for _ in range(warmup):
+        function(argument)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(argument)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """Estatísticas de uma lista de tempos (ms)"""
+    values = np.asarray(samples)
+    summary = {
+        "samples": len(values),
+        "mean_ms": float(values.mean()),
+        "min_ms": float(values.min()),
+        "max_ms": float(values.max()),
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}_ms"] = float(np.percentile(values, percentile))
+    return summary
+
+
+def build_cases(frame):
+    """Casos medidos para um frame: lista de (nome, função, argumento)
+
+    Cada função recebe o argumento já preparado, de forma que só o trabalho
+    do caso entra na medição.
+    """
+    binary = ops.to_binary(frame)
+    cases = []
+
+    # Aba de imagem: funções que alocam o resultado
+    for name, function in ops.OPERATIONS.items():
+        cases.append((f"image.{name}", function, frame))
+
+    # Aba de vídeo: cadeia compilada com buffers reutilizados
+    for name in ops.OPERATIONS:
+        chain = ops.make_video_chain([name])
+        cases.append((f"video.{name}", chain.apply, frame))
+
+    # Análises sobre a imagem binária
+    cases.append(("analysis.count_objects", ops.count_objects, binary))
+    cases.append(("analysis.calculate_metrics", ops.calculate_metrics, binary))
+
+    # Detector de microfone
+    segmenter = RedColorSegmenter()
+    cases.append(("microphone.red_segmentation", segmenter.segment, frame))
+
+    return cases
+
+
+def build_matching_cases(frame, workers):
+    """Casos do caminho de casamento ORB (independentes da resolução da ROI)"""
+    descriptors = [des for _, des in load_template_descriptors() if len(des) > 0]
+    scorer = RoiScorer(descriptors, workers=1, max_distance=MAX_MATCH_DISTANCE)
+    detector = MicrophoneDetector(workers=workers, max_distance=MAX_MATCH_DISTANCE).init()
+
+    # ROI de tamanho típico extraída do frame
+    h, w = frame.shape[:2]
+    roi = frame[h // 4:h // 4 + h // 5, w // 4:w // 4 + w // 6]
+    detection_frame = cv2.resize(frame, (640, 480))
+
+    def detect(frame):
+        detector.reset()  # Sempre busca completa, sem a janela da detecção anterior
+        return detector.process(frame)
+
+    cases = [
+        ("microphone.orb_roi_score", scorer.score, roi),
+        ("microphone.detect_frame_640x480", detect, detection_frame),
+    ]
+    return cases, (scorer, detector)
+
+
+def run(resolutions, repeats=20, warmup=3, allocations=True, case_filter=None, workers=None, seed=0):
+    """Executa o benchmark; retorna a lista de resultados (um dict por caso e resolução)"""
+    results = []
+    matching_done = False
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        frame = synthetic_frame(width, height, seed)
+        cases = build_cases(frame)
+
+        # O caminho ORB trabalha sobre ROIs 100x100 e frames 640x480:
+        # medido uma vez, com o frame da primeira resolução
+        owners = ()
+        if not matching_done:
+            matching_cases, owners = build_matching_cases(frame, workers)
+            cases.extend(matching_cases)
+            matching_done = True
+
+        for name, function, argument in cases:
+            if case_filter and not any(part in name for part in case_filter):
+                continue
+            samples = time_case(function, argument, repeats, warmup)
+            result = {"case": name, "resolution": resolution, "width": width, "height": height}
+            result.update(summarize(samples))
+            if allocations:
+                result["alloc_bytes"] = ops.measure_frame_allocations(
+                    function, argument, frames=min(repeats, 10), warmup=1)
+            results.append(result)
+            print(f"{resolution:>6} {name:<36} p50 {result['p50_ms']:9.3f} ms  "
+                  f"p95 {result['p95_ms']:9.3f} ms"
+                  + (f"  {result['alloc_bytes'] / 1024:10.1f} KiB" if allocations else ""))
+
+        for owner in owners:
+            owner.close()
+    return results
+
+
+def run_kernel_scaling(resolutions, kernels=KERNEL_SIZES, repeats=20, warmup=3, workers=None, seed=0):
+    """Compara cada filtro de vizinhança em uma chamada e em faixas paralelas
+
+    Retorna um dict por (resolução, operação, kernel) com as medianas das duas
+    execuções, o ganho (single / strips) e as threads das faixas e do OpenCV.
+    Com uma única thread apply_in_strips faz a chamada única (ganho ~1x).
+    """
+    threads = strip_workers(workers)
+    print(f"Faixas com {threads} thread(s); OpenCV com {cv2.getNumThreads()} thread(s), "
+          f"{os.cpu_count()} núcleo(s)")
+    rows = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        frame = synthetic_frame(width, height, seed)
+        for name in NEIGHBORHOOD_OPERATIONS:
+            operation = ops.OPERATIONS[name]
+            for kernel_size in kernels:
+                single = time_case(lambda image: operation(image, kernel_size), frame, repeats, warmup)
+                strips = time_case(lambda image: apply_in_strips(name, image, workers, kernel_size=kernel_size),
+                                   frame, repeats, warmup)
+                row = {"resolution": resolution, "operation": name, "kernel_size": kernel_size,
+                       "workers": threads, "opencv_threads": cv2.getNumThreads(),
+                       "single_p50_ms": float(np.percentile(single, 50)),
+                       "strips_p50_ms": float(np.percentile(strips, 50))}
+                row["speedup"] = row["single_p50_ms"] / row["strips_p50_ms"]
+                rows.append(row)
+                print(f"{resolution:>6} {name:<10} {kernel_size:>2}x{kernel_size:<2} "
+                      f"chamada única {row['single_p50_ms']:9.3f} ms  faixas {row['strips_p50_ms']:9.3f} ms  "
+                      f"({row['speedup']:.2f}x)")
+    return rows
+
+
+def environment():
+    """Versões e máquina, para comparar resultados entre execuções"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def compare(results, baseline):
+    """Compara a mediana de cada caso com um resultado anterior
+
+    Retorna [(caso, resolução, p50_anterior, p50_atual, razão)] para os casos
+    presentes nos dois, com razão = atual / anterior.
+    """
+    previous = {(r["case"], r["resolution"]): r for r in baseline["results"]}
+    rows = []
+    for result in results:
+        old = previous.get((result["case"], result["resolution"]))
+        if old is None or old["p50_ms"] <= 0:
+            continue
+        rows.append((result["case"], result["resolution"], old["p50_ms"], result["p50_ms"],
+                     result["p50_ms"] / old["p50_ms"]))
+    return rows
+
+
+def parse_list(value, available, kind):
+    """Converte 'a,b' em lista validando contra os nomes disponíveis"""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    for name in names:
+        if name not in available:
+            raise argparse.ArgumentTypeError(
+                f"{kind} desconhecida: {name} (disponíveis: {', '.join(available)})")
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das operações de imagem e vídeo")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS),
+                        help=f"Resoluções separadas por vírgula (padrão: todas - {', '.join(RESOLUTIONS)})")
+    parser.add_argument("--repeats", type=int, default=20, help="Medições por caso (padrão: 20)")
+    parser.add_argument("--warmup", type=int, default=3, help="Execuções descartadas por caso (padrão: 3)")
+    parser.add_argument("--cases", default="",
+                        help="Só os casos cujo nome contém um destes trechos (ex.: video.,analysis.)")
+    parser.add_argument("--no-allocations", action="store_true", help="Não medir memória alocada")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Threads do detector de microfone e das faixas paralelas (padrão: número de núcleos)")
+    parser.add_argument("--threads", type=int, default=None, help="Threads internas do OpenCV")
+    parser.add_argument("--kernel-scaling", action="store_true",
+                        help="Medir os filtros de vizinhança em uma chamada e em faixas paralelas "
+                             f"(kernels {', '.join(map(str, KERNEL_SIZES))}; --workers threads)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos frames sintéticos")
+    parser.add_argument("--output", default="benchmark.json", help="Arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args(argv)
+
+    try:
+        resolutions = parse_list(args.resolutions, RESOLUTIONS, "Resolução")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    case_filter = [part.strip() for part in args.cases.split(",") if part.strip()]
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    results = run(resolutions, args.repeats, args.warmup, not args.no_allocations,
+                  case_filter, args.workers, args.seed)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "settings": {"repeats": args.repeats, "warmup": args.warmup, "seed": args.seed,
+                     "workers": args.workers},
+        "results": results,
+    }
+    if args.kernel_scaling:
+        print("\nFiltros de vizinhança: chamada única x faixas paralelas (mediana)")
+        report["kernel_scaling"] = run_kernel_scaling(resolutions, KERNEL_SIZES, args.repeats, args.warmup,
+                                                      args.workers, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados salvos em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = 0
+        print(f"\nComparação com {args.compare} (mediana):")
+        for name, resolution, old, new, ratio in compare(results, baseline):
+            flag = ""
+            if ratio > 1 + REGRESSION_THRESHOLD:
+                flag = "  REGRESSÃO"
+                regressions += 1
+            elif ratio < 1 - REGRESSION_THRESHOLD:
+                flag = "  melhora"
+            print(f"{resolution:>6} {name:<36} {old:9.3f} -> {new:9.3f} ms ({ratio:5.2f}x){flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
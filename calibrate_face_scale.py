@@ -0,0 +1,69 @@
+"""Calibração da escala de detecção de rostos
+
+Lê frames de um vídeo (ou da câmera), mede tempo e precisão da detecção Haar
+em várias escalas, com e sem equalização, e grava a tabela em JSON. A aba de
+vídeo usa essa tabela (face_scale_table.json) para escolher a escala mais
+rápida que mantém a revocação mínima.
+
+Exemplo:
+    python calibrate_face_scale.py gravacao.mp4 --frames 200 --min-recall 0.95
+"""
+import argparse
+import sys
+
+import cv2
+
+from detectors import (DEFAULT_SCALE_TABLE, benchmark_detection_scales, choose_detection_scale,
+                       save_scale_table)
+
+
+def read_gray_frames(source, count):
+    """Lê até count frames da fonte (arquivo ou 'camera') em tons de cinza"""
+    capture = cv2.VideoCapture(0 if source == "camera" else source)
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    finally:
+        capture.release()
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibração da escala de detecção de rostos")
+    parser.add_argument("source", help="Arquivo de vídeo ou 'camera'")
+    parser.add_argument("--frames", type=int, default=200, help="Número de frames usados (padrão: 200)")
+    parser.add_argument("--scales", default="1.0,0.75,0.5,0.35,0.25",
+                        help="Escalas testadas, separadas por vírgula")
+    parser.add_argument("--min-recall", type=float, default=0.95,
+                        help="Revocação mínima para escolher a escala (padrão: 0.95)")
+    parser.add_argument("--output", default=DEFAULT_SCALE_TABLE,
+                        help=f"Arquivo JSON de saída (padrão: {DEFAULT_SCALE_TABLE})")
+    args = parser.parse_args(argv)
+
+    frames = read_gray_frames(args.source, args.frames)
+    if not frames:
+        print(f"Não foi possível ler frames de {args.source}")
+        return 1
+
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    scales = [float(scale) for scale in args.scales.split(",")]
+    table = benchmark_detection_scales(face_cascade, frames, scales=scales)
+
+    print(f"{'escala':>7} {'equaliz.':>9} {'ms/frame':>9} {'revocação':>10} {'precisão':>9}")
+    for row in table:
+        print(f"{row['scale']:>7.2f} {'sim' if row['equalize'] else 'não':>9} "
+              f"{row['ms_per_frame']:>9.2f} {row['recall']:>10.3f} {row['precision']:>9.3f}")
+
+    save_scale_table(table, args.output)
+    scale, equalize = choose_detection_scale(table, args.min_recall)
+    print(f"Tabela salva em {args.output}. Escala escolhida: {scale} "
+          f"(equalização: {'sim' if equalize else 'não'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,856 @@
+import glob
+import hashlib
+import json
+import os
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+import image_operations as ops
+
+# =========================================================================
+# DETECÇÃO DE ROSTOS EM ESCALA REDUZIDA
+# =========================================================================
+
+# Tamanho mínimo de rosto (em pixels da resolução original)
+MIN_FACE_SIZE = 30
+
+# Tabela de escala x precisão gerada por calibrate_face_scale.py
+DEFAULT_SCALE_TABLE = "face_scale_table.json"
+
+
+class ScaledFaceDetector:
+    """Detector Haar de rostos que trabalha sobre o frame reduzido
+
+    O frame em tons de cinza é reduzido por scale (INTER_AREA) em um buffer
+    reutilizado, opcionalmente equalizado, e as caixas encontradas são
+    convertidas de volta para coordenadas da resolução original. O tamanho
+    mínimo de rosto é ajustado para continuar valendo MIN_FACE_SIZE pixels
+    no frame original.
+    """
+
+    def __init__(self, face_cascade, scale=1.0, equalize=False):
+        if not 0 < scale <= 1:
+            raise ValueError("A escala de detecção deve estar em (0, 1]")
+        self.face_cascade = face_cascade
+        self.scale = scale
+        self.equalize = equalize
+        self.pool = ops.BufferPool()
+
+    def detect(self, gray):
+        """Retorna as caixas (x, y, w, h) dos rostos em coordenadas do frame original"""
+        small = gray
+        if self.scale < 1:
+            h, w = gray.shape[:2]
+            size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            small = cv2.resize(gray, size, dst=self.pool.get("small", (size[1], size[0])),
+                               interpolation=cv2.INTER_AREA)
+        if self.equalize:
+            small = cv2.equalizeHist(small, dst=self.pool.get("equalized", small.shape))
+
+        min_size = max(1, round(MIN_FACE_SIZE * self.scale))
+        faces = self.face_cascade.detectMultiScale(small, 1.1, 5, minSize=(min_size, min_size))
+
+        return [tuple(int(round(v / self.scale)) for v in face) for face in faces]
+
+
+def _iou(a, b):
+    """Interseção sobre união de duas caixas (x, y, w, h)"""
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    intersection = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def benchmark_detection_scales(face_cascade, gray_frames, scales=(1.0, 0.75, 0.5, 0.35, 0.25),
+                               equalize_options=(False, True), iou_threshold=0.5):
+    """Mede velocidade e precisão da detecção de rostos em cada escala
+
+    A referência é a detecção em resolução total sem equalização. Para cada
+    combinação (escala, equalização) retorna o tempo médio por frame e a
+    revocação/precisão em relação à referência (caixas com IoU >= iou_threshold).
+    O resultado é uma lista de dicionários que pode ser salva com
+    save_scale_table e usada com choose_detection_scale.
+    """
+    reference_detector = ScaledFaceDetector(face_cascade)
+    references = [reference_detector.detect(gray) for gray in gray_frames]
+
+    table = []
+    for scale in scales:
+        for equalize in equalize_options:
+            detector = ScaledFaceDetector(face_cascade, scale, equalize)
+            matched = found = 0
+            start = time.perf_counter()
+            detections = [detector.detect(gray) for gray in gray_frames]
+            elapsed = time.perf_counter() - start
+
+            for reference, detected in zip(references, detections):
+                found += len(detected)
+                matched += sum(1 for box in reference
+                               if any(_iou(box, other) >= iou_threshold for other in detected))
+
+            expected = sum(len(reference) for reference in references)
+            table.append({
+                "scale": scale,
+                "equalize": equalize,
+                "ms_per_frame": 1000 * elapsed / max(1, len(gray_frames)),
+                "recall": matched / expected if expected else 1.0,
+                "precision": matched / found if found else 1.0,
+            })
+
+    return table
+
+
+def save_scale_table(table, path):
+    """Salva a tabela de escala x precisão em JSON"""
+    with open(path, "w", encoding="utf-8") as table_file:
+        json.dump(table, table_file, indent=2)
+
+
+def load_scale_table(path):
+    """Carrega a tabela de escala x precisão salva por save_scale_table"""
+    with open(path, encoding="utf-8") as table_file:
+        return json.load(table_file)
+
+
+def choose_detection_scale(table, min_recall=0.95):
+    """Escolhe a configuração mais rápida com revocação >= min_recall
+
+    Retorna (escala, equalizar); sem nenhuma configuração aceitável, usa a
+    resolução total sem equalização.
+    """
+    accepted = [row for row in table if row["recall"] >= min_recall]
+    if not accepted:
+        return 1.0, False
+    best = min(accepted, key=lambda row: row["ms_per_frame"])
+    return best["scale"], best["equalize"]
+
+
+# =========================================================================
+# RASTREAMENTO DE ROSTOS (DETECTAR E DEPOIS RASTREAR)
+# =========================================================================
+
+class FaceTracker:
+    """Detecção de rostos e olhos com agendamento detectar-e-rastrear
+
+    A detecção completa (detectMultiScale no frame inteiro) roda apenas a cada
+    detect_interval frames ou quando o rastreamento perde confiança. Nos
+    demais frames cada rosto é procurado só em uma janela ampliada em torno da
+    última posição, por correlação com o recorte obtido na última detecção
+    (cv2.matchTemplate). Os olhos são detectados de novo apenas quando o rosto
+    se move mais que move_threshold pixels.
+
+    Com detection_scale < 1 a detecção completa roda sobre o frame reduzido
+    (e opcionalmente equalizado) e as caixas são convertidas de volta para a
+    resolução original, onde são feitos o rastreamento e a busca dos olhos.
+    """
+
+    def __init__(self, face_cascade, eye_cascade, detect_interval=10, search_margin=0.5,
+                 min_confidence=0.6, move_threshold=4, detection_scale=1.0, equalize=False):
+        self.face_cascade = face_cascade
+        self.eye_cascade = eye_cascade
+        self.detector = ScaledFaceDetector(face_cascade, detection_scale, equalize)
+        self.detect_interval = detect_interval
+        self.search_margin = search_margin
+        self.min_confidence = min_confidence
+        self.move_threshold = move_threshold
+
+        self.tracks = []  # [{"box": (x, y, w, h), "template": recorte, "eyes": [...]}]
+        self.frames_since_detection = 0
+        self.last_mode = None  # "deteccao" ou "rastreamento", útil para depuração
+
+    def reset(self):
+        """Esquece os rostos rastreados; o próximo frame faz detecção completa"""
+        self.tracks = []
+        self.frames_since_detection = 0
+
+    def _detect_eyes(self, gray, box):
+        """Detecta olhos na metade superior do rosto (coordenadas relativas ao rosto)"""
+        x, y, w, h = box
+        roi_gray = gray[y:y + int(h / 2), x:x + w]
+        if roi_gray.size == 0:
+            return []
+        return [tuple(int(v) for v in eye) for eye in self.eye_cascade.detectMultiScale(roi_gray, 1.1, 3)]
+
+    def _detect(self, gray):
+        """Detecção completa no frame inteiro"""
+        faces = self.detector.detect(gray)
+        self.tracks = []
+        for (x, y, w, h) in faces:
+            box = (int(x), int(y), int(w), int(h))
+            self.tracks.append({
+                "box": box,
+                "template": gray[y:y + h, x:x + w].copy(),
+                "eyes": self._detect_eyes(gray, box),
+            })
+        self.frames_since_detection = 0
+        self.last_mode = "deteccao"
+
+    def _track(self, gray):
+        """Procura cada rosto perto da última posição; retorna False se algum se perdeu"""
+        frame_h, frame_w = gray.shape[:2]
+        for track in self.tracks:
+            x, y, w, h = track["box"]
+            margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+            x1, y1 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+
+            window = gray[y0:y1, x0:x1]
+            template = track["template"]
+            if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                return False
+
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, confidence, _, (best_x, best_y) = cv2.minMaxLoc(scores)
+            if confidence < self.min_confidence:
+                return False
+
+            new_box = (x0 + best_x, y0 + best_y, w, h)
+            if max(abs(new_box[0] - x), abs(new_box[1] - y)) > self.move_threshold:
+                track["eyes"] = self._detect_eyes(gray, new_box)
+                track["box"] = new_box
+
+        self.frames_since_detection += 1
+        self.last_mode = "rastreamento"
+        return True
+
+    def update(self, gray):
+        """Processa um frame em tons de cinza
+
+        Retorna uma lista de (caixa_do_rosto, olhos), com olhos em coordenadas
+        relativas ao canto superior esquerdo do rosto.
+        """
+        if (not self.tracks or self.frames_since_detection >= self.detect_interval
+                or not self._track(gray)):
+            self._detect(gray)
+
+        return [(track["box"], track["eyes"]) for track in self.tracks]
+
+
+# =========================================================================
+# ÍNDICE DE DESCRITORES DOS TEMPLATES DO MICROFONE (COM CACHE EM DISCO)
+# =========================================================================
+
+TEMPLATE_PATTERN = "microphone_template*.jpg"
+TEMPLATE_CACHE = "microphone_templates.npz"
+TEMPLATE_SIZE = (100, 100)
+ORB_FEATURES = 500
+
+# Distância de Hamming máxima (de 256 bits) de um casamento ORB aceito e
+# pontuação mínima de uma detecção com esse limite. Com os templates
+# distorcidos (escala, rotação, ruído) a pontuação ficou em 10 ou mais em 90%
+# dos casos; em ROIs sem microfone, no máximo 7
+MAX_MATCH_DISTANCE = 64
+MATCH_THRESHOLD = 8
+
+
+def find_template_files(pattern=TEMPLATE_PATTERN):
+    """Lista os templates pelo padrão glob, em ordem natural (template2 antes de template10)"""
+    def natural_key(path):
+        return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", path)]
+    return sorted(glob.glob(pattern), key=natural_key)
+
+
+def _file_hash(path):
+    with open(path, "rb") as template_file:
+        return hashlib.sha1(template_file.read()).hexdigest()
+
+
+def _synthetic_template():
+    """Template sintético usado quando não há imagens do microfone"""
+    template = np.zeros((50, 30), dtype=np.uint8)
+    cv2.rectangle(template, (10, 5), (20, 45), 255, -1)  # Cabo
+    cv2.circle(template, (15, 15), 10, 255, -1)  # Cabeça
+    return template
+
+
+def _compute_descriptors(detector, template_gray, size):
+    """Redimensiona o template e extrai os descritores ORB (vazio se não houver)"""
+    template = cv2.resize(template_gray, size)
+    _, descriptors = detector.detectAndCompute(template, None)
+    if descriptors is None:
+        return np.empty((0, 32), np.uint8)
+    return descriptors
+
+
+def load_template_descriptors(pattern=TEMPLATE_PATTERN, cache_path=TEMPLATE_CACHE,
+                              nfeatures=ORB_FEATURES, size=TEMPLATE_SIZE):
+    """Carrega os descritores ORB dos templates, usando o cache em disco
+
+    O cache (.npz) guarda os descritores de cada arquivo junto com o hash SHA-1
+    do conteúdo e os parâmetros do ORB; só os templates novos ou alterados são
+    reprocessados, e o cache é regravado quando algo muda. Sem nenhum arquivo
+    de template é usado um template sintético (não armazenado em cache).
+    Retorna uma lista de (nome, descritores) na ordem dos arquivos; templates
+    sem características ficam com um array vazio.
+    """
+    params = json.dumps({"nfeatures": nfeatures, "size": list(size), "opencv": cv2.__version__})
+    detector = cv2.ORB_create(nfeatures=nfeatures)
+
+    files = find_template_files(pattern)
+    if not files:
+        return [("sintético", _compute_descriptors(detector, _synthetic_template(), size))]
+
+    # Ler o cache existente (ignorado se os parâmetros forem diferentes)
+    cached = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cache:
+                if str(cache["params"]) == params:
+                    offsets, descriptors = cache["offsets"], cache["descriptors"]
+                    for i, (name, digest) in enumerate(zip(cache["files"], cache["hashes"])):
+                        cached[(str(name), str(digest))] = descriptors[offsets[i]:offsets[i + 1]]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Cache de templates inválido, recriando: {e}")
+
+    results = []
+    changed = False
+    for path in files:
+        name = os.path.basename(path)
+        digest = _file_hash(path)
+        descriptors = cached.get((name, digest))
+        if descriptors is None:
+            template = cv2.imread(path)
+            if template is None:
+                continue
+            template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            descriptors = _compute_descriptors(detector, template_gray, size)
+            changed = True
+        results.append((name, digest, descriptors))
+
+    # Regravar o cache se algum template mudou (ou foi removido)
+    if cache_path and (changed or len(cached) != len(results)):
+        offsets = np.cumsum([0] + [len(descriptors) for _, _, descriptors in results])
+        np.savez(cache_path,
+                 params=np.array(params),
+                 files=np.array([name for name, _, _ in results]),
+                 hashes=np.array([digest for _, digest, _ in results]),
+                 offsets=offsets,
+                 descriptors=np.concatenate([descriptors for _, _, descriptors in results]))
+
+    return [(name, descriptors) for name, _, descriptors in results]
+
+
+# =========================================================================
+# CASAMENTO CONTRA TODOS OS TEMPLATES DE UMA VEZ
+# =========================================================================
+
+class TemplateMatcher:
+    """Casamento de descritores ORB contra todos os templates em uma só consulta
+
+    Os descritores de todos os templates são empilhados em uma única matriz,
+    com o id do template de cada linha. Cada consulta faz uma única chamada
+    BFMatcher.match (Hamming) e, por template, uma seleção parcial
+    (np.partition) dos good_fraction melhores casamentos, em vez de ordenar
+    todos os DMatch.
+
+    A pontuação de um template é o número desses melhores casamentos com
+    distância <= max_distance. Com max_distance None vale a regra original:
+    pontuação = int(good_fraction * casamentos encontrados), sem olhar as
+    distâncias (MicrophoneDetector usa MAX_MATCH_DISTANCE).
+    """
+
+    def __init__(self, template_descriptors, good_fraction=0.3, max_distance=None):
+        template_descriptors = [descriptors for descriptors in template_descriptors if len(descriptors) > 0]
+        if not template_descriptors:
+            raise ValueError("Nenhum template com descritores")
+
+        counts = np.array([len(descriptors) for descriptors in template_descriptors])
+        self.descriptors = np.concatenate(template_descriptors)
+        self.template_ids = np.repeat(np.arange(len(counts)), counts)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.good_counts = (counts * good_fraction).astype(int)
+        self.good_fraction = good_fraction
+        self.max_distance = max_distance
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+
+    def __len__(self):
+        return len(self.good_counts)
+
+    def scores(self, frame_descriptors):
+        """Retorna a pontuação de cada template (array com um valor por template)"""
+        scores = np.zeros(len(self), int)
+        if frame_descriptors is None or len(frame_descriptors) == 0:
+            return scores
+
+        # Uma única consulta: o melhor casamento de cada descritor de template
+        matches = self.matcher.match(self.descriptors, frame_descriptors)
+        query_indices = np.fromiter((m.queryIdx for m in matches), np.intp, len(matches))
+
+        # Sem limite de distância: good_fraction dos casamentos de cada template
+        if self.max_distance is None:
+            found = np.bincount(self.template_ids[query_indices], minlength=len(self))
+            return (found * self.good_fraction).astype(int)
+
+        distances = np.full(len(self.descriptors), np.inf, np.float32)
+        distances[query_indices] = np.fromiter((m.distance for m in matches), np.float32, len(matches))
+
+        for template_id, k in enumerate(self.good_counts):
+            if k == 0:
+                continue
+            segment = distances[self.offsets[template_id]:self.offsets[template_id + 1]]
+            good = np.partition(segment, k - 1)[:k]  # k menores distâncias, sem ordenar tudo
+            scores[template_id] = np.count_nonzero(good <= self.max_distance)
+
+        return scores
+
+
+# =========================================================================
+# PONTUAÇÃO DAS ROIs CANDIDATAS EM PARALELO
+# =========================================================================
+
+class RoiScorer:
+    """Extrai ORB e pontua várias ROIs candidatas em um pool de threads
+
+    O OpenCV libera o GIL em resize/cvtColor/detectAndCompute/match, então
+    as ROIs de um frame são processadas em paralelo. Cada thread tem seu
+    próprio detector ORB, matcher e buffers (threading.local), pois esses
+    objetos não são compartilháveis entre threads. O resultado não depende
+    da ordem de término: vence a maior pontuação e, no empate, a primeira
+    ROI da lista (como no laço sequencial).
+    """
+
+    def __init__(self, template_descriptors, workers=None, nfeatures=ORB_FEATURES,
+                 size=TEMPLATE_SIZE, min_features=10, good_fraction=0.3,
+                 max_distance=MAX_MATCH_DISTANCE):
+        self.template_descriptors = list(template_descriptors)
+        self.nfeatures = nfeatures
+        self.size = size
+        self.min_features = min_features
+        self.good_fraction = good_fraction
+        self.max_distance = max_distance
+        # Valida os templates uma vez, antes de criar as threads
+        TemplateMatcher(self.template_descriptors, good_fraction, max_distance)
+
+        self.workers = workers or os.cpu_count() or 1
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def _worker_state(self):
+        """Detector, matcher e buffers da thread atual (criados no primeiro uso)"""
+        state = self._local.__dict__
+        if not state:
+            state["detector"] = cv2.ORB_create(nfeatures=self.nfeatures)
+            state["matcher"] = TemplateMatcher(self.template_descriptors, self.good_fraction, self.max_distance)
+            state["pool"] = ops.BufferPool()
+        return state
+
+    def score(self, roi):
+        """Pontuação de uma ROI (BGR) contra o melhor template; 0 se houver poucas características"""
+        state = self._worker_state()
+        pool = state["pool"]
+        width, height = self.size
+        resized = cv2.resize(roi, self.size, dst=pool.get("roi", (height, width, 3)))
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=pool.get("roi_gray", (height, width)))
+        _, descriptors = state["detector"].detectAndCompute(gray, None)
+        if descriptors is None or len(descriptors) <= self.min_features:
+            return 0
+        return int(state["matcher"].scores(descriptors).max())
+
+    def best(self, rois):
+        """Retorna (pontuação, índice) da melhor ROI, ou (0, None) se nenhuma pontuar"""
+        if self._executor is None or len(rois) < 2:
+            scores = [self.score(roi) for roi in rois]
+        else:
+            scores = list(self._executor.map(self.score, rois))
+
+        best_score, best_index = 0, None
+        for index, score in enumerate(scores):
+            if score > best_score:
+                best_score, best_index = score, index
+        return best_score, best_index
+
+    def close(self):
+        """Encerra o pool de threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# =========================================================================
+# SEGMENTAÇÃO DE VERMELHO POR TABELA DE CONSULTA (LUT)
+# =========================================================================
+
+# Ranges de vermelho em HSV (o vermelho fica nos dois extremos do espectro)
+RED_HSV_RANGES = (
+    ((0, 120, 70), (10, 255, 255)),
+    ((170, 120, 70), (180, 255, 255)),
+)
+
+# Tabelas já construídas, por conjunto de ranges (compartilhadas entre instâncias)
+_LUT_CACHE = {}
+
+
+def build_color_lut(hsv_ranges):
+    """Constrói a tabela BGR -> máscara (0/255) para todas as 2^24 cores
+
+    Cada posição b | g << 8 | r << 16 recebe 255 se a cor, convertida para HSV
+    pelo OpenCV, cair em algum dos ranges; o resultado é idêntico ao de
+    cvtColor + inRange, mas calculado uma única vez.
+    """
+    key = tuple((tuple(lower), tuple(upper)) for lower, upper in hsv_ranges)
+    if key not in _LUT_CACHE:
+        codes = np.arange(1 << 24, dtype=np.uint32)
+        colors = np.empty((1 << 24, 3), np.uint8)
+        colors[:, 0] = codes & 0xFF
+        colors[:, 1] = (codes >> 8) & 0xFF
+        colors[:, 2] = codes >> 16
+        hsv = cv2.cvtColor(colors.reshape(4096, 4096, 3), cv2.COLOR_BGR2HSV)
+
+        lut = np.zeros((4096, 4096), np.uint8)
+        for lower, upper in key:
+            cv2.bitwise_or(lut, cv2.inRange(hsv, np.array(lower), np.array(upper)), dst=lut)
+        _LUT_CACHE[key] = lut.ravel()
+
+    return _LUT_CACHE[key]
+
+
+class RedColorSegmenter:
+    """Segmentação de cor por tabela de consulta, com limpeza morfológica fundida
+
+    A máscara é obtida com uma única consulta por pixel a uma tabela
+    BGR -> máscara, reconstruída apenas quando os ranges mudam. A abertura
+    seguida de fechamento com o mesmo elemento k x k (erosão, dilatação,
+    dilatação, erosão) é executada como erosão k, dilatação (2k-1), erosão k,
+    com resultado idêntico e uma passada a menos.
+    """
+
+    # Quantos tamanhos de entrada manter com buffers alocados
+    MAX_SHAPES = 4
+
+    def __init__(self, hsv_ranges=RED_HSV_RANGES, kernel_size=5):
+        self.kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        self.double_kernel = np.ones((2 * kernel_size - 1, 2 * kernel_size - 1), np.uint8)
+        self._ranges = None
+        self.hsv_ranges = hsv_ranges
+        # Buffers por tamanho de entrada (frame inteiro e janelas de busca),
+        # mantendo apenas os mais recentes
+        self._buffers = OrderedDict()
+
+    @property
+    def hsv_ranges(self):
+        return self._ranges
+
+    @hsv_ranges.setter
+    def hsv_ranges(self, hsv_ranges):
+        hsv_ranges = tuple((tuple(lower), tuple(upper)) for lower, upper in hsv_ranges)
+        if hsv_ranges != self._ranges:
+            self._ranges = hsv_ranges
+            self.lut = build_color_lut(hsv_ranges)
+
+    def _get_buffers(self, h, w):
+        """Buffers (canais, máscara, resultado) para entradas h x w"""
+        buffers = self._buffers.get((h, w))
+        if buffers is None:
+            buffers = self._buffers[(h, w)] = (np.zeros((h, w, 8), np.uint8),
+                                               np.empty((h, w), np.uint8),
+                                               np.empty((h, w), np.uint8))
+            if len(self._buffers) > self.MAX_SHAPES:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end((h, w))
+        return buffers
+
+    def segment(self, frame):
+        """Retorna a máscara (0/255) das regiões na cor configurada
+
+        A máscara fica em um buffer reutilizado, válido até a próxima chamada.
+        """
+        h, w = frame.shape[:2]
+        channels, mask, cleaned = self._get_buffers(h, w)
+        # Copiar B, G, R para os 3 primeiros bytes de um buffer de 8 canais
+        # zerado: lido como int64 (little-endian), cada pixel vira o índice
+        # b | g << 8 | r << 16, já no tipo usado por take (sem conversão)
+        cv2.mixChannels([frame], [channels], [0, 0, 1, 1, 2, 2])
+        codes = channels.view(np.int64).reshape(h, w)
+
+        # mode="clip" evita a cópia temporária que take faz com out= (índices são sempre válidos)
+        self.lut.take(codes, out=mask, mode="clip")
+
+        # Abertura + fechamento fundidos
+        cv2.erode(mask, self.kernel, dst=cleaned)
+        cv2.dilate(cleaned, self.double_kernel, dst=mask)
+        cv2.erode(mask, self.kernel, dst=cleaned)
+        return cleaned
+
+
+# =========================================================================
+# AGENDAMENTO DA DETECÇÃO DO MICROFONE
+# =========================================================================
+
+class MicrophoneSearchScheduler:
+    """Decide quais frames processar e em que região procurar o microfone
+
+    - Pulo de frames adaptativo: o tempo de processamento é medido (média
+      móvel) e, se for maior que o intervalo entre frames, os frames que
+      chegariam nesse meio-tempo são pulados (até max_skip seguidos).
+    - Busca local: com o microfone confirmado, só uma janela em torno da
+      última posição é examinada. O frame inteiro volta a ser examinado
+      quando o microfone se perde ou a cada refresh_interval frames
+      processados (para achar um segundo microfone, por exemplo).
+
+    As janelas têm largura e altura múltiplas de window_step, o que limita os
+    tamanhos distintos (e os buffers) usados pela segmentação.
+    """
+
+    def __init__(self, frame_interval, refresh_interval=15, search_margin=0.75,
+                 window_step=64, max_skip=5, smoothing=0.2):
+        self.frame_interval = frame_interval
+        self.refresh_interval = refresh_interval
+        self.search_margin = search_margin
+        self.window_step = window_step
+        self.max_skip = max_skip
+        self.smoothing = smoothing
+
+        self.average_time = None
+        self.skip = 0  # Frames pulados após cada frame processado
+        self.frames_to_skip = 0
+        self.location = None  # Última posição confirmada (x, y, w, h)
+        self.frames_since_full = 0
+
+    def reset(self):
+        """Esquece a última posição; o próximo frame faz busca completa"""
+        self.location = None
+        self.frames_since_full = 0
+
+    def should_process(self):
+        """Chamado a cada frame lido; False indica que o frame deve ser pulado"""
+        if self.frames_to_skip > 0:
+            self.frames_to_skip -= 1
+            return False
+        return True
+
+    def record_time(self, elapsed):
+        """Registra o tempo (s) gasto no frame processado e ajusta o pulo"""
+        if self.average_time is None:
+            self.average_time = elapsed
+        else:
+            self.average_time += self.smoothing * (elapsed - self.average_time)
+        frames_spent = math.ceil(self.average_time / self.frame_interval) if self.frame_interval > 0 else 1
+        self.skip = min(self.max_skip, max(0, frames_spent - 1))
+        self.frames_to_skip = self.skip
+
+    def search_region(self, frame_shape):
+        """Região (x0, y0, x1, y1) a examinar no próximo frame processado"""
+        frame_h, frame_w = frame_shape[:2]
+        if self.location is None or self.frames_since_full >= self.refresh_interval:
+            return (0, 0, frame_w, frame_h)
+
+        x, y, w, h = self.location
+        step = self.window_step
+        window_w = min(frame_w, math.ceil(w * (1 + 2 * self.search_margin) / step) * step)
+        window_h = min(frame_h, math.ceil(h * (1 + 2 * self.search_margin) / step) * step)
+        # Centralizar na última posição, deslocando para dentro do frame
+        x0 = min(max(0, x + w // 2 - window_w // 2), frame_w - window_w)
+        y0 = min(max(0, y + h // 2 - window_h // 2), frame_h - window_h)
+        return (x0, y0, x0 + window_w, y0 + window_h)
+
+    def is_full(self, region, frame_shape):
+        """Indica se a região cobre o frame inteiro"""
+        return region == (0, 0, frame_shape[1], frame_shape[0])
+
+    def report(self, region, frame_shape, location):
+        """Registra o resultado da busca (location=None se não confirmado)"""
+        if self.is_full(region, frame_shape):
+            self.frames_since_full = 0
+        else:
+            self.frames_since_full += 1
+        self.location = location
+
+
+# =========================================================================
+# MOTORES DE DETECÇÃO (SEM INTERFACE GRÁFICA)
+# =========================================================================
+
+FACE_CASCADE = "haarcascade_frontalface_default.xml"
+EYE_CASCADE = "haarcascade_eye.xml"
+
+
+class FaceEyeDetector:
+    """Motor de detecção de rostos e olhos, independente da interface
+
+    init() carrega os classificadores e escolhe a escala de detecção pela
+    tabela de calibração (se existir); depois process(frame) pode ser chamado
+    a cada frame. Uma instância guarda o estado do rastreamento, então deve
+    ser usada por um único fluxo de vídeo de cada vez.
+    """
+
+    def __init__(self, face_cascade_path=None, eye_cascade_path=None, detect_interval=10,
+                 scale_table=DEFAULT_SCALE_TABLE, detection_scale=None, equalize=False):
+        self.face_cascade_path = face_cascade_path or cv2.data.haarcascades + FACE_CASCADE
+        self.eye_cascade_path = eye_cascade_path or cv2.data.haarcascades + EYE_CASCADE
+        self.detect_interval = detect_interval
+        self.scale_table = scale_table
+        self.detection_scale = detection_scale  # None: usar a tabela (ou 1.0)
+        self.equalize = equalize
+        self.tracker = None
+        self.pool = ops.BufferPool()
+
+    def init(self):
+        """Carrega modelos e parâmetros; lança IOError se os classificadores faltarem"""
+        face_cascade = cv2.CascadeClassifier(self.face_cascade_path)
+        eye_cascade = cv2.CascadeClassifier(self.eye_cascade_path)
+        if face_cascade.empty() or eye_cascade.empty():
+            raise IOError("Classificadores não encontrados")
+
+        if self.detection_scale is None:
+            self.detection_scale = 1.0
+            if self.scale_table and os.path.exists(self.scale_table):
+                try:
+                    self.detection_scale, self.equalize = choose_detection_scale(load_scale_table(self.scale_table))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Erro ao ler tabela de escalas: {e}")
+
+        self.tracker = FaceTracker(face_cascade, eye_cascade, detect_interval=self.detect_interval,
+                                   detection_scale=self.detection_scale, equalize=self.equalize)
+        return self
+
+    def reset(self):
+        """Esquece os rostos rastreados (ex.: ao trocar de vídeo)"""
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def process(self, frame):
+        """Detecta rostos em um frame BGR (ou em tons de cinza)
+
+        Retorna uma lista de (caixa_do_rosto, olhos), com olhos em coordenadas
+        relativas ao canto superior esquerdo do rosto.
+        """
+        if self.tracker is None:
+            self.init()
+        gray = frame
+        if frame.ndim == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.pool.get("gray", frame.shape[:2]))
+        return self.tracker.update(gray)
+
+
+class MicrophoneDetector:
+    """Motor de detecção do microfone vermelho, independente da interface
+
+    init() carrega os descritores dos templates (do cache em disco quando
+    possível) e cria o pool de threads que pontua as ROIs. process(frame)
+    pré-filtra por cor, pontua as regiões candidatas e devolve as detecções
+    confirmadas (pontuação acima de threshold, em casamentos com distância de
+    Hamming <= max_distance entre os 30% melhores de cada template). A busca fica restrita a uma
+    janela em torno da última detecção (ver MicrophoneSearchScheduler).
+
+    Com um profiler (instrumentation.StageProfiler) a pré-filtragem é
+    registrada como estágio "detect" e a pontuação ORB como "match".
+    """
+
+    def __init__(self, template_pattern=TEMPLATE_PATTERN, cache_path=TEMPLATE_CACHE,
+                 threshold=MATCH_THRESHOLD, max_distance=MAX_MATCH_DISTANCE, frame_interval=1.0 / 30,
+                 workers=None, min_area=300, padding=15, profiler=None):
+        self.template_pattern = template_pattern
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self.max_distance = max_distance
+        self.workers = workers
+        self.min_area = min_area
+        self.padding = padding
+        self.profiler = profiler
+
+        self.templates = []  # [(nome, descritores)], preenchido por init()
+        self.roi_scorer = None
+        self.segmenter = RedColorSegmenter()
+        self.scheduler = MicrophoneSearchScheduler(frame_interval)
+        self.last_score = 0  # Melhor pontuação do último frame, mesmo abaixo do limiar
+
+    def init(self):
+        """Carrega os templates; lança ValueError se nenhum tiver características"""
+        self.templates = load_template_descriptors(self.template_pattern, self.cache_path)
+        descriptors = [des for _, des in self.templates if len(des) > 0]
+        if not descriptors:
+            raise ValueError("Não foi possível extrair características dos templates")
+        if self.roi_scorer is not None:
+            self.roi_scorer.close()
+        self.roi_scorer = RoiScorer(descriptors, workers=self.workers, good_fraction=0.3,
+                                    max_distance=self.max_distance)
+        return self
+
+    def reset(self, frame_interval=None):
+        """Prepara um novo vídeo: esquece a última posição e, opcionalmente, muda o FPS"""
+        self.scheduler = MicrophoneSearchScheduler(frame_interval or self.scheduler.frame_interval)
+        self.last_score = 0
+
+    def should_process(self):
+        """Pulo de frames adaptativo: False se o próximo frame deve ser pulado"""
+        return self.scheduler.should_process()
+
+    def _stage(self, name):
+        return self.profiler.stage(name) if self.profiler else nullcontext()
+
+    def _search(self, frame, region):
+        """Procura o microfone na região (x0, y0, x1, y1); retorna (pontuação, (x, y, w, h))"""
+        x0, y0, x1, y1 = region
+        search_frame = frame[y0:y1, x0:x1]
+
+        # Pré-filtragem por cor vermelha
+        with self._stage("detect"):
+            red_mask = self.segmenter.segment(search_frame)
+            contours = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours = contours[0] if len(contours) == 2 else contours[1]
+
+        rois = []
+        locations = []
+        for contour in contours:
+            if cv2.contourArea(contour) < self.min_area:
+                continue
+
+            x, y, w, h = cv2.boundingRect(contour)
+            # Filtrar formas não retangulares
+            if not 0.3 <= w / h <= 3.0:
+                continue
+
+            # Expandir ROI
+            x = max(0, x - self.padding)
+            y = max(0, y - self.padding)
+            w = min(search_frame.shape[1] - x, w + 2 * self.padding)
+            h = min(search_frame.shape[0] - y, h + 2 * self.padding)
+            if w <= 0 or h <= 0:
+                continue
+
+            rois.append(search_frame[y:y + h, x:x + w])
+            locations.append((x0 + x, y0 + y, w, h))  # Coordenadas no frame inteiro
+
+        with self._stage("match"):
+            score, index = self.roi_scorer.best(rois)
+        return score, locations[index] if index is not None else None
+
+    def process(self, frame):
+        """Procura o microfone em um frame BGR
+
+        Retorna uma lista de (caixa, pontuação) com as detecções confirmadas
+        (no máximo uma, a de maior pontuação).
+        """
+        if self.roi_scorer is None:
+            self.init()
+        started = time.perf_counter()
+
+        # Janela em torno da última detecção ou frame inteiro;
+        # se o microfone se perder na janela, busca no frame inteiro
+        region = self.scheduler.search_region(frame.shape)
+        score, location = self._search(frame, region)
+        if score <= self.threshold and not self.scheduler.is_full(region, frame.shape):
+            region = (0, 0, frame.shape[1], frame.shape[0])
+            score, location = self._search(frame, region)
+
+        confirmed = location if score > self.threshold else None
+        self.scheduler.report(region, frame.shape, confirmed)
+        self.scheduler.record_time(time.perf_counter() - started)
+        self.last_score = score
+        return [(confirmed, score)] if confirmed is not None else []
+
+    def close(self):
+        """Encerra o pool de threads"""
+        if self.roi_scorer is not None:
+            self.roi_scorer.close()
+            self.roi_scorer = None
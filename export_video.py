@@ -0,0 +1,73 @@
+"""Exportação de vídeos processados pela linha de comando
+
+Aplica uma cadeia de operações a um ou mais arquivos de vídeo e grava o
+resultado sem exibição, tão rápido quanto a CPU permitir (útil para converter
+horas de gravação em lote).
+
+Exemplo:
+    python export_video.py saida/ gravacao1.mp4 gravacao2.mp4 --ops grayscale,median
+
+Com --workers N (N > 1) cada vídeo é dividido em intervalos de frames
+processados em N processos e depois juntados em ordem pelo ffmpeg, sem
+recodificar; sem o ffmpeg instalado, o vídeo é processado em série.
+
+Assim como batch_process.py, não importa a interface gráfica.
+"""
+import argparse
+import os
+import sys
+
+import image_operations as ops
+from video_pipeline import render_video_parallel, render_video_to_file
+
+
+def print_progress(done, total, fps):
+    """Mostra o progresso na mesma linha do terminal"""
+    percent = f"{100 * done / total:.1f}%" if total > 0 else "?"
+    print(f"\r  {done}/{total} frames ({percent}) - {fps:.1f} frames/s", end="", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportação de vídeos processados")
+    parser.add_argument("output_dir", help="Diretório onde os vídeos processados serão gravados")
+    parser.add_argument("videos", nargs="+", help="Arquivos de vídeo de entrada")
+    parser.add_argument("--ops", required=True,
+                        help=f"Cadeia de operações separadas por vírgula ({', '.join(ops.OPERATIONS)})")
+    parser.add_argument("--format", default="mp4", help="Extensão de saída (padrão: mp4)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos por vídeo; acima de 1 divide o vídeo em segmentos juntados "
+                             "com o ffmpeg (sem o ffmpeg, processa em série; padrão: 1)")
+    args = parser.parse_args(argv)
+
+    steps = [name.strip() for name in args.ops.split(",") if name.strip()]
+    invalid = [name for name in steps if name not in ops.OPERATIONS]
+    if not steps or invalid:
+        parser.error(f"Cadeia inválida: {', '.join(invalid) or 'vazia'}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    errors = 0
+
+    for video_path in args.videos:
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        output_path = os.path.join(args.output_dir, f"{name}.{args.format}")
+        print(f"{video_path} -> {output_path}")
+
+        try:
+            if args.workers > 1:
+                stats = render_video_parallel(video_path, output_path, steps, workers=args.workers,
+                                              progress=print_progress)
+            else:
+                stats = render_video_to_file(video_path, output_path, steps, progress=print_progress)
+        except IOError as e:
+            print(f"\n  Erro: {e}")
+            errors += 1
+            continue
+
+        print(f"\n  Concluído: {stats['frames']} frames em {stats['seconds']:.1f}s "
+              f"({stats['fps']:.1f} frames/s)")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Histórico de desfazer/refazer da aba de imagem
+
+ImageHistory guarda os passos aplicados à imagem (nome da operação de
+image_operations.OPERATIONS e seus parâmetros) e o resultado de cada um. Os
+resultados são marcados como somente leitura e compartilhados por
+referência: restaurar o original, desfazer, refazer ou uma operação que
+devolve a própria entrada (ex.: tons de cinza de uma imagem já em cinza) não
+copiam a imagem. Quem precisar alterar um resultado deve copiá-lo antes.
+
+A memória dos resultados guardados é limitada por memory_budget. Quando ela
+é excedida, os passos usados há mais tempo são primeiro compactados
+(resultados binários viram bits empacotados, 8x menores) e, se ainda não
+bastar, descartados. Um passo descartado é recalculado quando volta a ser
+exibido, reaplicando as operações a partir do passo guardado mais próximo
+antes dele. O original e o passo atual nunca são descartados, então o
+histórico nunca ocupa mais que o orçamento além dessas duas imagens.
+
+Com um ResultCache (result_cache.py), as operações e os recálculos passam
+pelo cache: refazer um passo já calculado para a mesma imagem não o recalcula.
+
+Para a edição rápida, os passos (recipe()) podem ser reaplicados sobre outra
+versão da imagem com rebuild_history(): por exemplo, editar sobre uma cópia
+reduzida ao tamanho de exibição (proxy_image()) e depois reaplicar os mesmos
+passos sobre o original em resolução total, em segundo plano.
+
+Não importa a interface gráfica.
+"""
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import image_operations as ops
+
+# Passo que volta à imagem original (Restaurar Original)
+ORIGINAL = "original"
+
+# Orçamento padrão para os resultados guardados (bytes)
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Operações cujo resultado é binário (0/255) e pode ser guardado em bits
+BINARY_OPERATIONS = ("binary", "canny")
+
+# Tamanho máximo da cópia usada na edição rápida (o mesmo da exibição)
+PROXY_SIZE = (800, 600)
+
+
+def _freeze(image):
+    """Marca a imagem como somente leitura e a retorna"""
+    image.setflags(write=False)
+    return image
+
+
+class HistoryStep:
+    """Um passo do histórico: operação, parâmetros e resultado (se guardado)"""
+
+    def __init__(self, name, params, label, image):
+        self.name = name
+        self.params = params
+        self.label = label
+        self.image = image  # Resultado somente leitura, ou None
+        self.packed = None  # (bits, shape) quando compactado
+
+    @property
+    def kept(self):
+        return self.image is not None or self.packed is not None
+
+    @property
+    def nbytes(self):
+        if self.image is not None:
+            return self.image.nbytes
+        if self.packed is not None:
+            return self.packed[0].nbytes
+        return 0
+
+    def pack(self):
+        """Troca o resultado binário por bits empacotados"""
+        self.packed = (np.packbits(self.image > 0), self.image.shape)
+        self.image = None
+
+    def unpacked(self):
+        """Resultado reconstruído a partir dos bits empacotados"""
+        bits, shape = self.packed
+        image = np.unpackbits(bits, count=int(np.prod(shape))).reshape(shape)
+        return np.multiply(image, 255, out=image)
+
+
+class ImageHistory:
+    """Passos aplicados à imagem, com desfazer/refazer e memória limitada"""
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, cache=None):
+        self.memory_budget = memory_budget
+        self.cache = cache  # ResultCache opcional
+        self.clear()
+
+    def clear(self):
+        """Descarta todo o histórico"""
+        self.steps = []
+        self.index = -1
+        self._recent = OrderedDict()  # Índices dos passos, do usado há mais tempo ao mais recente
+        self.replays = 0  # Passos recalculados depois de descartados
+
+    def reset(self, image, label="Original"):
+        """Começa um novo histórico a partir da imagem (que passa a ser somente leitura)"""
+        self.clear()
+        self.steps.append(HistoryStep(ORIGINAL, {}, label, _freeze(image)))
+        self.index = 0
+        self._touch(0)
+        return image
+
+    @property
+    def original(self):
+        return self.steps[0].image if self.steps else None
+
+    @property
+    def current(self):
+        return self._image(self.index) if self.steps else None
+
+    @property
+    def can_undo(self):
+        return self.index > 0
+
+    @property
+    def can_redo(self):
+        return 0 <= self.index < len(self.steps) - 1
+
+    @property
+    def undo_label(self):
+        """Nome do passo que undo() desfaz, ou None"""
+        return self.steps[self.index].label if self.can_undo else None
+
+    @property
+    def redo_label(self):
+        """Nome do passo que redo() refaz, ou None"""
+        return self.steps[self.index + 1].label if self.can_redo else None
+
+    def recipe(self):
+        """Passos do original até o passo atual: lista de (nome, parâmetros, rótulo)"""
+        return [(step.name, step.params, step.label) for step in self.steps[1:self.index + 1]]
+
+    def apply(self, name, label=None, **params):
+        """Aplica a operação à imagem atual e registra o passo; retorna o resultado
+
+        name é uma chave de ops.OPERATIONS ou ORIGINAL (volta ao original).
+        """
+        result = self._run(name, params, self.current)
+        return self.push(name, result, params, label)
+
+    def push(self, name, result, params=None, label=None):
+        """Registra um passo já calculado (descarta os passos que poderiam ser refeitos)"""
+        for index in range(self.index + 1, len(self.steps)):
+            self._recent.pop(index, None)
+        del self.steps[self.index + 1:]
+
+        self.steps.append(HistoryStep(name, dict(params or {}), label or name, _freeze(result)))
+        self.index += 1
+        self._touch(self.index)
+        self._enforce_budget()
+        return result
+
+    def undo(self):
+        """Volta um passo; retorna a imagem resultante (None se não há o que desfazer)"""
+        if not self.can_undo:
+            return None
+        self.index -= 1
+        return self._activate()
+
+    def redo(self):
+        """Refaz o passo desfeito; retorna a imagem resultante (None se não há o que refazer)"""
+        if not self.can_redo:
+            return None
+        self.index += 1
+        return self._activate()
+
+    def memory_used(self):
+        """Bytes ocupados pelos resultados guardados (buffers compartilhados contam uma vez)"""
+        seen = set()
+        total = 0
+        for step in self.steps:
+            if step.image is not None:
+                if id(step.image) in seen:
+                    continue
+                seen.add(id(step.image))
+            total += step.nbytes
+        return total
+
+    def _run(self, name, params, image):
+        if name == ORIGINAL:
+            return self.original
+        if self.cache is not None:
+            return self.cache.apply(name, image, **params)
+        return ops.OPERATIONS[name](image, **params)
+
+    def _touch(self, index):
+        self._recent[index] = None
+        self._recent.move_to_end(index)
+
+    def _activate(self):
+        image = self._image(self.index)
+        self._enforce_budget()
+        return image
+
+    def _image(self, index):
+        """Resultado do passo, reconstruído ou recalculado se necessário"""
+        step = self.steps[index]
+        self._touch(index)
+        if step.image is None:
+            if step.packed is not None:
+                step.image = _freeze(step.unpacked())
+                step.packed = None
+            else:
+                step.image = _freeze(self._replay(index))
+        return step.image
+
+    def _replay(self, index):
+        """Recalcula o passo a partir do passo guardado mais próximo antes dele"""
+        start = index - 1
+        while not self.steps[start].kept:
+            start -= 1  # O original (índice 0) está sempre guardado
+        step = self.steps[start]
+        image = step.image if step.image is not None else step.unpacked()
+
+        # Resultados intermediários não são guardados, para não estourar o orçamento
+        for step in self.steps[start + 1:index + 1]:
+            image = self._run(step.name, step.params, image)
+            self.replays += 1
+        return image
+
+    def _shared(self, step):
+        """True se outro passo guarda o mesmo buffer (liberá-lo aqui não libera memória)"""
+        return any(other is not step and other.image is step.image for other in self.steps)
+
+    def _enforce_budget(self):
+        """Compacta e depois descarta os passos usados há mais tempo até caber no orçamento"""
+        used = self.memory_used()
+        if used <= self.memory_budget:
+            return
+
+        pinned = (0, self.index)
+        candidates = [i for i in self._recent if i not in pinned]
+
+        for index in candidates:
+            step = self.steps[index]
+            if step.image is not None and step.name in BINARY_OPERATIONS and not self._shared(step):
+                step.pack()
+                used = self.memory_used()
+                if used <= self.memory_budget:
+                    return
+
+        for index in candidates:
+            step = self.steps[index]
+            if step.kept and (step.image is None or not self._shared(step)):
+                step.image = None
+                step.packed = None
+                used = self.memory_used()
+                if used <= self.memory_budget:
+                    return
+
+
+def proxy_image(image, max_size=PROXY_SIZE):
+    """Cópia reduzida para caber em max_size (a própria imagem se já couber)"""
+    h, w = image.shape[:2]
+    max_width, max_height = max_size
+    if w <= max_width and h <= max_height:
+        return image
+    scale = min(max_width / w, max_height / h)
+    return cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def rebuild_history(image, recipe, memory_budget=DEFAULT_MEMORY_BUDGET, cache=None,
+                    progress=None, cancelled=None):
+    """Novo ImageHistory com os passos de recipe reaplicados sobre image
+
+    progress(feitos, total) é chamado depois de cada passo. Se cancelled()
+    retornar True entre dois passos, a reconstrução para e retorna None.
+    """
+    history = ImageHistory(memory_budget, cache)
+    history.reset(image)
+    total = len(recipe)
+    for done, (name, params, label) in enumerate(recipe, 1):
+        if cancelled is not None and cancelled():
+            return None
+        history.apply(name, label, **params)
+        if progress is not None:
+            progress(done, total)
+    return history
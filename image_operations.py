@@ -0,0 +1,372 @@
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# =========================================================================
+# ROTULAGEM DE COMPONENTES CONEXOS
+# =========================================================================
+
+def label_components(binary, connectivity=8):
+    """Rotula os componentes conexos de uma imagem binária
+
+    Considera como objeto os pixels com valor 255 (mesma regra do antigo
+    crescimento de região). Retorna uma tupla (quantidade, rótulos,
+    estatísticas, centroides), onde o mapa de rótulos usa 0 para o fundo
+    e 1..N para os objetos, e as estatísticas/centroides (uma linha por
+    objeto, sem o fundo) seguem o formato do cv2.connectedComponentsWithStats
+    (x, y, largura, altura, área).
+    """
+    if connectivity not in (4, 8):
+        raise ValueError("Conectividade deve ser 4 ou 8")
+
+    # Máscara de objetos: apenas pixels iguais a 255
+    mask = (binary == 255).view(np.uint8)
+
+    # Rotulagem em duas passadas com union-find (implementação do OpenCV)
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        mask, connectivity=connectivity, ltype=cv2.CV_32S)
+
+    # Remover a linha do fundo (rótulo 0)
+    return num_labels - 1, labels, stats[1:], centroids[1:]
+
+
+
+# =========================================================================
+# OPERAÇÕES DE IMAGEM (SEM DEPENDÊNCIA DA INTERFACE)
+# =========================================================================
+
+# Elemento estruturante padrão (5x5), criado uma única vez
+KERNEL_5X5 = np.ones((5, 5), np.uint8)
+
+
+def _square_kernel(kernel_size=5):
+    if kernel_size == 5:
+        return KERNEL_5X5
+    return np.ones((kernel_size, kernel_size), np.uint8)
+
+
+def to_grayscale(image):
+    """Converte para tons de cinza (imagens já em cinza são devolvidas como estão)"""
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def to_negative(image):
+    """Converte para negativo"""
+    return 255 - image
+
+
+def to_binary(image):
+    """Converte para binária usando o método de Otsu"""
+    gray = to_grayscale(image)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def ensure_binary(image):
+    """Garante uma imagem binária, aplicando Otsu se ela ainda não for"""
+    if len(image.shape) == 3 or np.max(image) > 1:
+        return to_binary(image)
+    return image
+
+
+def mean_filter(image, kernel_size=5):
+    """Aplica o filtro da média"""
+    return cv2.blur(image, (kernel_size, kernel_size))
+
+
+def median_filter(image, kernel_size=5):
+    """Aplica o filtro da mediana"""
+    return cv2.medianBlur(image, kernel_size)
+
+
+def canny(image, low_threshold=100, high_threshold=200):
+    """Aplica o detector de bordas Canny"""
+    return cv2.Canny(to_grayscale(image), low_threshold, high_threshold)
+
+
+def erosion(image, kernel_size=5):
+    """Aplica erosão com elemento estruturante quadrado"""
+    kernel = _square_kernel(kernel_size)
+    return cv2.erode(image, kernel, iterations=1)
+
+
+def dilation(image, kernel_size=5):
+    """Aplica dilatação com elemento estruturante quadrado"""
+    kernel = _square_kernel(kernel_size)
+    return cv2.dilate(image, kernel, iterations=1)
+
+
+def opening(image, kernel_size=5):
+    """Aplica abertura com elemento estruturante quadrado"""
+    kernel = _square_kernel(kernel_size)
+    return cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
+
+
+def closing(image, kernel_size=5):
+    """Aplica fechamento com elemento estruturante quadrado"""
+    kernel = _square_kernel(kernel_size)
+    return cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
+
+
+# Operações que produzem uma nova imagem, indexadas pelo nome usado na CLI
+OPERATIONS = {
+    "grayscale": to_grayscale,
+    "negative": to_negative,
+    "binary": to_binary,
+    "mean": mean_filter,
+    "median": median_filter,
+    "canny": canny,
+    "erosion": erosion,
+    "dilation": dilation,
+    "opening": opening,
+    "closing": closing,
+}
+
+
+# =========================================================================
+# ANÁLISES (RETORNAM VALORES EM VEZ DE IMAGENS)
+# =========================================================================
+
+def calculate_metrics(image):
+    """Calcula área, perímetro e diâmetro do maior objeto da imagem binária
+
+    Retorna um dicionário com as métricas, ou None se não houver objetos.
+    """
+    return largest_object_metrics(ensure_binary(image))
+
+
+def largest_object_metrics(binary):
+    """Métricas do maior objeto de uma imagem já binária (ver calculate_metrics)"""
+    # Encontrar contornos
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    largest_contour = max(contours, key=cv2.contourArea)
+    area = cv2.contourArea(largest_contour)
+    perimeter = cv2.arcLength(largest_contour, True)
+
+    # Diâmetro do círculo com mesma área
+    diameter = 2 * np.sqrt(area / np.pi)
+
+    return {"area": area, "perimeter": perimeter, "diameter": diameter}
+
+
+def count_objects(image, connectivity=8):
+    """Conta os objetos da imagem binária (componentes conexos)"""
+    count, _, _, _ = label_components(ensure_binary(image), connectivity=connectivity)
+    return count
+
+
+# Análises disponíveis na CLI
+ANALYSES = {
+    "metrics": calculate_metrics,
+    "count": count_objects,
+}
+
+
+def apply_operations(image, operations):
+    """Aplica uma sequência de operações (nomes de OPERATIONS) a uma imagem"""
+    for name in operations:
+        image = OPERATIONS[name](image)
+    return image
+
+
+# =========================================================================
+# POOL DE BUFFERS PARA PROCESSAMENTO FRAME A FRAME
+# =========================================================================
+
+class BufferPool:
+    """Pool de buffers reutilizáveis indexados por nome, formato e tipo
+
+    get() devolve sempre os mesmos arrays para a mesma chave, de forma que as
+    operações possam escrever em buffers de destino (dst=) em vez de alocar
+    novas matrizes a cada frame. Com slots > 1 os buffers são entregues em
+    rodízio, para resultados que continuam em uso enquanto o próximo frame
+    é processado (ex.: frames em fila para exibição).
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8, slots=1):
+        key = (name, tuple(shape), np.dtype(dtype))
+        ring = self._buffers.get(key)
+        if ring is None:
+            ring = self._buffers[key] = [np.empty(shape, dtype) for _ in range(slots)]
+        if len(ring) == 1:
+            return ring[0]
+        buffer = ring.pop(0)
+        ring.append(buffer)
+        return buffer
+
+    def clear(self):
+        """Libera todos os buffers do pool"""
+        self._buffers.clear()
+
+    @property
+    def nbytes(self):
+        """Memória total ocupada pelos buffers do pool"""
+        return sum(buffer.nbytes for ring in self._buffers.values() for buffer in ring)
+
+
+def measure_frame_allocations(process_frame, frame, frames=50, warmup=5):
+    """Mede a memória alocada temporariamente por frame em regime permanente
+
+    Executa process_frame(frame) algumas vezes para aquecer os pools e depois
+    mede, com tracemalloc, o pico de memória alocada além da já existente em
+    cada chamada. Retorna a média em bytes; um único array do tamanho do frame
+    alocado por chamada aparece como pelo menos frame.nbytes.
+    """
+    for _ in range(warmup):
+        process_frame(frame)
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            process_frame(frame)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - baseline
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return total / frames
+
+
+# =========================================================================
+# CADEIA DE OPERAÇÕES PARA VÍDEO (COMPILADA E COM BUFFERS REUTILIZADOS)
+# =========================================================================
+
+
+# Implementações que escrevem no buffer de destino (dst), para serem usadas
+# frame a frame sem alocar novas matrizes. Cada entrada indica se a operação
+# exige entrada em tons de cinza e se a saída é em tons de cinza.
+_FRAME_STEPS = {
+    "grayscale": (lambda src, dst: cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=dst), False, True),
+    "negative": (lambda src, dst: cv2.bitwise_not(src, dst=dst), False, None),
+    "binary": (lambda src, dst: cv2.threshold(src, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)[1],
+               True, True),
+    "mean": (lambda src, dst, kernel_size=5: cv2.blur(src, (kernel_size, kernel_size), dst=dst), False, None),
+    "median": (lambda src, dst, kernel_size=5: cv2.medianBlur(src, kernel_size, dst=dst), False, None),
+    "canny": (lambda src, dst, low_threshold=100, high_threshold=200:
+              cv2.Canny(src, low_threshold, high_threshold, edges=dst), True, True),
+    "erosion": (lambda src, dst, kernel: cv2.erode(src, kernel, dst=dst), False, None),
+    "dilation": (lambda src, dst, kernel: cv2.dilate(src, kernel, dst=dst), False, None),
+    "opening": (lambda src, dst, kernel: cv2.morphologyEx(src, cv2.MORPH_OPEN, kernel, dst=dst), False, None),
+    "closing": (lambda src, dst, kernel: cv2.morphologyEx(src, cv2.MORPH_CLOSE, kernel, dst=dst), False, None),
+}
+
+_MORPHOLOGY = ("erosion", "dilation", "opening", "closing")
+
+# Parâmetros das operações de vídeo que diferem dos padrões da aba de imagem
+VIDEO_OPERATION_PARAMS = {
+    "canny": {"low_threshold": 50, "high_threshold": 150},
+}
+
+
+class OperationChain:
+    """Cadeia declarativa de operações aplicada a cada frame de um vídeo
+
+    Os passos são nomes de OPERATIONS ou tuplas (nome, parâmetros), por exemplo
+    ["grayscale", "median", "binary", ("opening", {"kernel_size": 3})].
+    A cadeia é compilada uma vez por formato de frame: conversões para tons de
+    cinza são inseridas uma única vez e compartilhadas pelos passos que as
+    exigem, passos redundantes são eliminados e cada passo escreve em um
+    buffer do BufferPool reaproveitado entre frames.
+
+    Como o resultado é escrito em buffers reutilizados, ele só permanece válido
+    até as próximas output_buffers chamadas de apply().
+    """
+
+    def __init__(self, steps, output_buffers=1, pool=None):
+        self.steps = []
+        for step in steps:
+            name, params = (step, {}) if isinstance(step, str) else (step[0], dict(step[1]))
+            if name not in _FRAME_STEPS:
+                raise ValueError(f"Operação desconhecida: {name}")
+            self.steps.append((name, params))
+
+        self.output_buffers = max(1, output_buffers)
+        self.pool = pool if pool is not None else BufferPool()
+        self._plans = {}
+
+    def __repr__(self):
+        return f"OperationChain({[name for name, _ in self.steps]})"
+
+    def _optimize(self, is_color):
+        """Elimina passos redundantes e funde passos compatíveis"""
+        optimized = []
+        for name, params in self.steps:
+            _, needs_gray, output_gray = _FRAME_STEPS[name]
+
+            if name == "grayscale" and not is_color:
+                continue  # Já está em tons de cinza
+
+            if needs_gray and is_color:
+                optimized.append(("grayscale", {}))  # Conversão única compartilhada
+                is_color = False
+
+            previous = optimized[-1][0] if optimized else None
+            if name == "negative" and previous == "negative":
+                optimized.pop()  # Negativo duas vezes é a identidade
+                continue
+            kernel_size = params.get("kernel_size", 5)
+            if ({previous, name} == {"erosion", "dilation"}
+                    and optimized[-1][1].get("kernel_size", 5) == kernel_size):
+                # Erosão seguida de dilatação é abertura (e vice-versa, fechamento)
+                optimized[-1] = ("opening" if previous == "erosion" else "closing",
+                                 {"kernel_size": kernel_size})
+                continue
+
+            optimized.append((name, params))
+            if output_gray:
+                is_color = False
+
+        return optimized
+
+    def compile(self, shape, dtype=np.uint8):
+        """Gera (e guarda) o plano de execução para frames com este formato"""
+        key = (tuple(shape), np.dtype(dtype))
+        if key in self._plans:
+            return self._plans[key]
+
+        is_color = len(shape) == 3
+        plan = []
+        steps = self._optimize(is_color)
+        for i, (name, params) in enumerate(steps):
+            function, _, output_gray = _FRAME_STEPS[name]
+            if output_gray:
+                is_color = False
+
+            params = dict(params)
+            if name in _MORPHOLOGY:
+                params["kernel"] = _square_kernel(params.pop("kernel_size", 5))
+
+            out_shape = tuple(shape[:2]) + ((3,) if is_color else ())
+            slots = self.output_buffers if i == len(steps) - 1 else 1
+            plan.append((function, params, (f"{id(self)}:{i}:{name}", out_shape, dtype, slots)))
+
+        self._plans[key] = plan
+        return plan
+
+    def apply(self, frame):
+        """Aplica a cadeia ao frame, escrevendo nos buffers pré-alocados"""
+        image = frame
+        for function, params, (name, shape, dtype, slots) in self.compile(frame.shape, frame.dtype):
+            image = function(image, self.pool.get(name, shape, dtype, slots), **params)
+        return image
+
+
+def make_video_chain(steps, output_buffers=1, pool=None):
+    """Cria a cadeia de operações de vídeo (nomes) com os parâmetros de vídeo"""
+    return OperationChain([(name, VIDEO_OPERATION_PARAMS.get(name, {})) for name in steps],
+                          output_buffers=output_buffers, pool=pool)
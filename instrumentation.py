@@ -0,0 +1,164 @@
+"""Instrumentação de latência por estágio dos loops de vídeo
+
+StageProfiler guarda, para cada estágio (captura, processamento, detecção,
+casamento, desenho, exibição, waitKey), os tempos dos últimos frames em
+janelas deslizantes. A partir delas calcula percentis, histogramas com
+faixas fixas (comparáveis entre execuções) e o FPS, exporta tudo em CSV ou
+JSON e desenha um resumo sobre o frame exibido.
+
+Não importa a interface gráfica.
+"""
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# Estágios conhecidos, na ordem em que aparecem nos relatórios
+STAGES = ("capture", "process", "detect", "match", "draw", "display", "waitkey")
+
+# Latência total de cada frame (da captura ao fim da exibição)
+FRAME = "frame"
+
+# Limites (ms) das faixas dos histogramas: escala logarítmica de 0,1 ms a ~1,6 s
+HISTOGRAM_EDGES_MS = tuple(round(0.1 * 2 ** (i / 2), 3) for i in range(29))
+
+DEFAULT_WINDOW = 300
+
+
+class StageProfiler:
+    """Tempos por estágio em janelas deslizantes dos últimos window frames
+
+    Pode ser alimentado por várias threads ao mesmo tempo (ex.: estágios do
+    VideoPipeline); as leituras trabalham sobre cópias das janelas.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Descarta todas as medições (ex.: ao iniciar um novo loop)"""
+        with self._lock:
+            self._samples = {}
+            self._frame_times = deque(maxlen=self.window)
+            self.frames = 0
+
+    def record(self, stage, seconds):
+        """Registra a duração (s) de um estágio"""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds * 1000)
+
+    @contextmanager
+    def stage(self, name):
+        """Mede o bloco 'with' como o estágio name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def frame_done(self, latency=None):
+        """Marca um frame exibido; latency (s) é registrada como FRAME se informada"""
+        if latency is not None:
+            self.record(FRAME, latency)
+        with self._lock:
+            self._frame_times.append(time.perf_counter())
+            self.frames += 1
+
+    @property
+    def fps(self):
+        """Frames exibidos por segundo na janela atual"""
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stages(self):
+        """Estágios medidos, na ordem de STAGES (demais ao final, e FRAME por último)"""
+        with self._lock:
+            names = list(self._samples)
+        known = [name for name in STAGES if name in names]
+        others = sorted(name for name in names if name not in STAGES and name != FRAME)
+        return known + others + ([FRAME] if FRAME in names else [])
+
+    def _values(self, stage):
+        with self._lock:
+            return np.array(self._samples.get(stage, ()), dtype=np.float64)
+
+    def percentile(self, stage, percentile):
+        """Percentil (ms) do estágio na janela atual, ou None sem medições"""
+        values = self._values(stage)
+        return float(np.percentile(values, percentile)) if len(values) else None
+
+    def histogram(self, stage):
+        """Contagem por faixa de HISTOGRAM_EDGES_MS (a última faixa vai até infinito)
+
+        Retorna len(HISTOGRAM_EDGES_MS) + 1 contagens: abaixo do primeiro
+        limite, entre limites consecutivos e acima do último.
+        """
+        values = self._values(stage)
+        return np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, values, side="right"),
+                           minlength=len(HISTOGRAM_EDGES_MS) + 1).tolist()
+
+    def summary(self):
+        """Estatísticas de todos os estágios: {estágio: {count, mean_ms, p50_ms, p95_ms, max_ms, histogram}}"""
+        result = {}
+        for stage in self.stages():
+            values = self._values(stage)
+            if not len(values):
+                continue
+            result[stage] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(values.max()),
+                "histogram": self.histogram(stage),
+            }
+        return result
+
+    def export(self, path):
+        """Grava o resumo em JSON ou CSV, conforme a extensão do arquivo"""
+        summary = self.summary()
+        if path.lower().endswith(".csv"):
+            bins = [f"<{HISTOGRAM_EDGES_MS[0]}ms"]
+            bins += [f"{low}-{high}ms" for low, high in zip(HISTOGRAM_EDGES_MS, HISTOGRAM_EDGES_MS[1:])]
+            bins += [f">={HISTOGRAM_EDGES_MS[-1]}ms"]
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "max_ms"] + bins)
+                for stage, stats in summary.items():
+                    writer.writerow([stage, stats["count"], f"{stats['mean_ms']:.3f}",
+                                     f"{stats['p50_ms']:.3f}", f"{stats['p95_ms']:.3f}",
+                                     f"{stats['max_ms']:.3f}"] + stats["histogram"])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"fps": self.fps, "frames": self.frames, "window": self.window,
+                           "histogram_edges_ms": HISTOGRAM_EDGES_MS, "stages": summary}, f, indent=2)
+
+    def draw_overlay(self, frame, origin=(10, 60)):
+        """Escreve FPS, latência p50/p95 e a mediana de cada estágio sobre o frame"""
+        x, y = origin
+        latency = ""
+        p50, p95 = self.percentile(FRAME, 50), self.percentile(FRAME, 95)
+        if p50 is not None:
+            latency = f" | latencia p50 {p50:.1f} ms p95 {p95:.1f} ms"
+        lines = [f"FPS {self.fps:.1f}{latency}"]
+
+        stages = [stage for stage in self.stages() if stage != FRAME]
+        if stages:
+            lines.append(" | ".join(f"{stage} {self.percentile(stage, 50):.1f}" for stage in stages))
+
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (x, y + 22 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+        return frame
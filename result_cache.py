@@ -0,0 +1,180 @@
+"""Cache dos resultados das operações e análises de imagem
+
+ResultCache memoriza o resultado de cada operação (ops.OPERATIONS) e análise
+pela chave (hash do conteúdo da imagem de entrada, operação, parâmetros).
+Resultados intermediários compartilhados também passam pelo cache: a
+binarização de Otsu e o Canny partem dos tons de cinza em cache, e as
+métricas e a contagem de objetos partem da binária em cache, de forma que
+alternar entre Binária, Calcular Métricas e Contar Objetos sobre a mesma
+imagem calcula cada etapa uma única vez.
+
+O hash (BLAKE2b) percorre a imagem inteira; para imagens somente leitura
+(ex.: os resultados do histórico e do próprio cache) ele é calculado uma vez
+por buffer e reaproveitado. A memória ocupada pelos resultados é limitada
+por max_bytes, descartando os usados há mais tempo.
+
+Pode ser usado por várias threads (ex.: a edição na interface e o
+processamento em resolução total em segundo plano); os cálculos são feitos
+fora da trava, então duas threads podem calcular o mesmo resultado ao mesmo
+tempo, mas só um é guardado.
+
+Não importa a interface gráfica.
+"""
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+import image_operations as ops
+
+# Memória padrão para os resultados guardados (bytes)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Operações que trabalham sobre os tons de cinza da entrada
+GRAYSCALE_OPERATIONS = ("binary", "canny")
+
+
+def _result_size(value):
+    """Memória aproximada de um resultado (arrays, tuplas de arrays ou valores pequenos)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_result_size(item) for item in value)
+    return 64
+
+
+def _freeze(value):
+    """Marca os arrays do resultado como somente leitura (resultados são compartilhados)"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class ResultCache:
+    """Resultados de operações e análises indexados pelo conteúdo da entrada"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # chave -> (resultado, bytes), do usado há mais tempo ao mais recente
+        self._digests = {}  # id(imagem somente leitura) -> (weakref, hash)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Descarta todos os resultados (os contadores são mantidos)"""
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Contadores do cache: acertos, faltas, descartes, entradas e memória"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+            }
+
+    def digest(self, image):
+        """Hash do conteúdo, formato e tipo da imagem"""
+        # Buffers somente leitura que não são vistas de outro array não mudam:
+        # o hash é guardado enquanto o array existir
+        immutable = not image.flags.writeable and image.base is None
+        if immutable:
+            with self._lock:
+                known = self._digests.get(id(image))
+            if known is not None and known[0]() is image:
+                return known[1]
+
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{image.shape}{image.dtype}".encode())
+        h.update(np.ascontiguousarray(image).data)
+        digest = h.digest()
+
+        if immutable:
+            key = id(image)
+            reference = weakref.ref(image, lambda _, key=key: self._digests.pop(key, None))
+            with self._lock:
+                self._digests[key] = (reference, digest)
+        return digest
+
+    def cached(self, name, image, compute, **params):
+        """Resultado de compute() para (conteúdo de image, name, params), calculado só na falta"""
+        key = (self.digest(image), name, tuple(sorted(params.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        result = compute()
+        if result is image:
+            return result  # Operação sem efeito: nada a guardar
+
+        size = _result_size(result)
+        if size <= self.max_bytes:
+            _freeze(result)
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (result, size)
+                    self.nbytes += size
+                    self._evict()
+        return result
+
+    def apply(self, name, image, **params):
+        """Operação de ops.OPERATIONS com cache"""
+        def compute():
+            source = image
+            if name in GRAYSCALE_OPERATIONS and image.ndim == 3:
+                source = self.apply("grayscale", image)
+            return ops.OPERATIONS[name](source, **params)
+
+        return self.cached(name, image, compute, **params)
+
+    def ensure_binary(self, image):
+        """ops.ensure_binary com a binarização de Otsu em cache"""
+        if len(image.shape) == 3 or np.max(image) > 1:
+            return self.apply("binary", image)
+        return image
+
+    def calculate_metrics(self, image):
+        """ops.calculate_metrics com cache (e com a binária em cache)"""
+        return self.cached("metrics", image,
+                           lambda: ops.largest_object_metrics(self.ensure_binary(image)))
+
+    def component_stats(self, image, connectivity=8):
+        """(quantidade, estatísticas, centroides) de ops.label_components da binária, com cache
+
+        O mapa de rótulos não é guardado (ocupa 4 bytes por pixel).
+        """
+        def compute():
+            count, _, stats, centroids = ops.label_components(self.ensure_binary(image), connectivity)
+            return count, stats, centroids
+
+        return self.cached("components", image, compute, connectivity=connectivity)
+
+    def count_objects(self, image, connectivity=8):
+        """ops.count_objects com cache"""
+        return self.component_stats(image, connectivity)[0]
+
+    def _evict(self):
+        """Descarta os resultados usados há mais tempo até caber em max_bytes; chamado com _lock"""
+        while self.nbytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
@@ -0,0 +1,175 @@
+"""Testes de alocação por frame das operações de vídeo
+
+Em regime permanente, a cadeia de operações e o pipeline de vídeo devem
+escrever em buffers reaproveitados: a memória alocada por frame precisa
+ficar muito abaixo do tamanho de um frame.
+
+Executar com:
+    python -m pytest -q test_image_operations.py
+"""
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+import image_operations as ops
+from video_pipeline import DROP_OLDEST, MAX_FRAMES_IN_FLIGHT, VideoPipeline
+
+FRAME_SHAPE = (480, 640, 3)
+
+# Fração do tamanho do frame tolerada por frame (objetos Python pequenos:
+# tuplas das filas, parâmetros, etc.)
+MAX_ALLOCATION_FRACTION = 0.01
+
+CHAINS = [
+    ["grayscale"],
+    ["negative"],
+    ["mean"],
+    ["grayscale", "median"],
+    ["binary", "opening"],
+    ["canny"],
+    ["erosion", "dilation"],
+    ["closing"],
+]
+
+
+class FakeCamera:
+    """Captura sintética: o frame n é preenchido com n % 256, lido no buffer recebido"""
+
+    def __init__(self, frames, shape=(120, 160, 3), delay=0.001):
+        self.frames = frames
+        self.shape = shape
+        self.delay = delay
+        self.count = 0
+
+    def isOpened(self):
+        return self.count < self.frames
+
+    def read(self, buffer=None):
+        time.sleep(self.delay)
+        self.count += 1
+        frame = buffer if buffer is not None else np.empty(self.shape, np.uint8)
+        frame[:] = self.count % 256
+        return True, frame
+
+    def get(self, prop):
+        return self.count
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8)
+
+
+@pytest.fixture
+def video_path(tmp_path, frame):
+    """Vídeo MJPG curto com o frame de teste deslocado a cada quadro"""
+    path = str(tmp_path / "entrada.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0,
+                             (FRAME_SHAPE[1], FRAME_SHAPE[0]))
+    if not writer.isOpened():
+        pytest.skip("Codec MJPG indisponível")
+    for i in range(60):
+        writer.write(np.roll(frame, i, axis=1))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("steps", CHAINS, ids=",".join)
+def test_operation_chain_allocations(steps, frame):
+    chain = ops.make_video_chain(steps, output_buffers=MAX_FRAMES_IN_FLIGHT)
+    allocated = ops.measure_frame_allocations(chain.apply, frame)
+    assert allocated < MAX_ALLOCATION_FRACTION * frame.nbytes
+
+
+@pytest.mark.parametrize("steps", [["grayscale", "median"], ["binary", "opening"]], ids=",".join)
+def test_video_pipeline_allocations(steps, video_path, frame):
+    capture = cv2.VideoCapture(video_path)
+    assert capture.isOpened()
+    chain = ops.make_video_chain(steps, output_buffers=MAX_FRAMES_IN_FLIGHT)
+    warmup = 15  # Enche os pools de captura e de saída
+    samples = []
+
+    def render_frame(processed, index):
+        # Pico alocado (em todas as threads) desde o frame anterior
+        _, peak = tracemalloc.get_traced_memory()
+        if len(samples) < warmup:
+            samples.append(None)
+        else:
+            samples.append(peak - state["baseline"])
+        tracemalloc.reset_peak()
+        state["baseline"], _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.start()
+    try:
+        state = {"baseline": tracemalloc.get_traced_memory()[0]}
+        shown = VideoPipeline(capture, chain.apply, render_frame).run()
+    finally:
+        tracemalloc.stop()
+        capture.release()
+
+    measured = [sample for sample in samples if sample is not None]
+    assert shown == 60 and measured
+    assert np.mean(measured) < MAX_ALLOCATION_FRACTION * frame.nbytes
+
+
+@pytest.mark.parametrize("slow_stage", ["process", "render"])
+def test_drop_oldest_frames_not_overwritten(slow_stage):
+    """Com descarte, nenhum frame é regravado enquanto é processado ou exibido"""
+    chain = ops.make_video_chain(["negative"], output_buffers=MAX_FRAMES_IN_FLIGHT)
+    delay = 0.02
+    corrupted = []
+    rendered = []
+
+    def process_frame(frame):
+        value = int(frame[0, 0, 0])
+        if slow_stage == "process":
+            time.sleep(delay)
+        if not (frame == value).all():
+            corrupted.append(("captura", value))
+        return chain.apply(frame)
+
+    def render_frame(processed, index):
+        expected = 255 - index % 256
+        if slow_stage == "render":
+            time.sleep(delay)
+        if not (processed == expected).all():
+            corrupted.append(("exibição", index))
+        rendered.append(index)
+
+    pipeline = VideoPipeline(FakeCamera(150), process_frame, render_frame, drop_policy=DROP_OLDEST)
+    pipeline.run()
+
+    assert pipeline.dropped_frames > 0 and rendered
+    assert rendered == sorted(rendered)
+    assert not corrupted
+
+
+def test_drop_oldest_pipeline_allocations():
+    camera = FakeCamera(200, shape=FRAME_SHAPE, delay=0.0005)
+    chain = ops.make_video_chain(["grayscale", "median"], output_buffers=MAX_FRAMES_IN_FLIGHT)
+    frame_bytes = int(np.prod(FRAME_SHAPE))
+    warmup = 10
+    samples = []
+
+    def render_frame(processed, index):
+        time.sleep(0.005)  # Exibição mais lenta que a captura: há descartes
+        _, peak = tracemalloc.get_traced_memory()
+        samples.append(peak - state["baseline"] if len(samples) >= warmup else None)
+        tracemalloc.reset_peak()
+        state["baseline"], _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.start()
+    try:
+        state = {"baseline": tracemalloc.get_traced_memory()[0]}
+        pipeline = VideoPipeline(camera, chain.apply, render_frame, drop_policy=DROP_OLDEST)
+        pipeline.run()
+    finally:
+        tracemalloc.stop()
+
+    measured = [sample for sample in samples if sample is not None]
+    assert pipeline.dropped_frames > 0 and measured
+    assert np.mean(measured) < MAX_ALLOCATION_FRACTION * frame_bytes
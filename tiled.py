@@ -0,0 +1,615 @@
+"""Processamento em blocos de imagens maiores que a memória
+
+As imagens ficam em arquivos mapeados em memória (.npy do NumPy ou raw) e são
+lidas, processadas e gravadas em blocos (tiles), de forma que só alguns
+blocos ficam na memória ao mesmo tempo. Os filtros de vizinhança (média,
+mediana, morfologia, Canny) leem cada bloco com uma borda extra (halo) do
+tamanho do alcance do filtro, o que torna o resultado de cada bloco igual ao
+da imagem inteira. Os blocos são processados em paralelo em um pool de
+threads (o OpenCV libera o GIL durante as operações).
+
+A binarização de Otsu usa o histograma da imagem inteira, somado bloco a
+bloco. A contagem de objetos e as métricas juntam os componentes conexos que
+atravessam as divisas dos blocos. Assim os resultados são os mesmos de
+image_operations sobre a imagem inteira em memória. A exceção é o Canny: a
+histerese segue bordas fracas por distâncias arbitrárias e, com um halo
+limitado (CANNY_HALO), pode diferir em alguns pixels junto às divisas.
+
+apply_in_strips() usa os mesmos blocos com halo para imagens em memória:
+divide a imagem em faixas horizontais e aplica um filtro de vizinhança a
+todas em paralelo, com progresso e cancelamento por faixa (medido por
+benchmark.py --kernel-scaling).
+
+Exemplo:
+    python tiled.py varredura.npy saida.npy --ops grayscale,median --analyses count,metrics
+    python tiled.py varredura.raw saida.npy --shape 60000x80000x3 --ops binary
+
+Não importa a interface gráfica.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+import image_operations as ops
+
+DEFAULT_TILE_SIZE = 1024
+
+# Halo do Canny: cobre o Sobel e a supressão de não máximos; a histerese além
+# dele pode diferir da imagem inteira junto às divisas dos blocos
+CANNY_HALO = 16
+
+# Operações cuja saída tem um único canal
+SINGLE_CHANNEL_OPERATIONS = ("grayscale", "binary", "canny")
+
+# Filtros de vizinhança (halo proporcional ao kernel) executados em faixas
+NEIGHBORHOOD_OPERATIONS = ("mean", "median", "erosion", "dilation", "opening", "closing")
+
+# Faixas por thread (mais faixas equilibram melhor a carga), mínimo de faixas
+# (para o progresso avançar aos poucos) e altura mínima de uma faixa
+STRIPS_PER_WORKER = 2
+MIN_STRIPS = 8
+MIN_STRIP_HEIGHT = 32
+
+
+class Cancelled(Exception):
+    """Processamento interrompido porque cancelled() retornou True"""
+
+
+# =========================================================================
+# ARQUIVOS MAPEADOS EM MEMÓRIA
+# =========================================================================
+
+def open_image(path, shape=None, dtype=np.uint8, mode="r"):
+    """Abre uma imagem mapeada em memória: .npy, ou raw (exige shape)"""
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode=mode)
+    if shape is None:
+        raise ValueError("Arquivos raw precisam do formato (altura, largura[, canais])")
+    return np.memmap(path, dtype=dtype, mode=mode, shape=tuple(shape))
+
+
+def create_image(path, shape, dtype=np.uint8):
+    """Cria uma imagem .npy mapeada em memória, para escrita"""
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+
+
+def import_image(image_path, npy_path):
+    """Converte um arquivo de imagem para .npy (o OpenCV lê o arquivo inteiro uma vez)"""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise IOError(f"Não foi possível ler a imagem: {image_path}")
+    output = create_image(npy_path, image.shape, image.dtype)
+    output[:] = image
+    output.flush()
+    return output
+
+
+# =========================================================================
+# BLOCOS COM HALO
+# =========================================================================
+
+def halo_for(name, params=None):
+    """Borda extra (pixels) que cada bloco precisa para a operação dar o resultado exato"""
+    params = params or {}
+    if name == "canny":
+        return CANNY_HALO
+    if name not in NEIGHBORHOOD_OPERATIONS:
+        return 0  # Operações ponto a ponto
+    radius = params.get("kernel_size", 5) // 2
+    # Abertura e fechamento aplicam dois filtros em sequência
+    return 2 * radius if name in ("opening", "closing") else radius
+
+
+def output_shape(name, shape):
+    """Formato do resultado da operação para uma entrada de formato shape"""
+    return tuple(shape[:2]) if name in SINGLE_CHANNEL_OPERATIONS else tuple(shape)
+
+
+def tile_grid(shape, tile_size=DEFAULT_TILE_SIZE):
+    """Blocos (y0, y1, x0, x1) que cobrem a imagem, linha a linha
+
+    tile_size é um inteiro ou (altura, largura); retorna (blocos, linhas, colunas).
+    """
+    height, width = shape[:2]
+    tile_height, tile_width = (tile_size, tile_size) if np.isscalar(tile_size) else tile_size
+    ys = list(range(0, height, tile_height))
+    xs = list(range(0, width, tile_width))
+    tiles = [(y, min(y + tile_height, height), x, min(x + tile_width, width)) for y in ys for x in xs]
+    return tiles, len(ys), len(xs)
+
+
+def read_block(source, tile, halo=0):
+    """Bloco de source com halo (cortado nas bordas da imagem); retorna (bloco, (dy, dx))
+
+    (dy, dx) é a posição do bloco sem halo dentro do bloco lido.
+    """
+    height, width = source.shape[:2]
+    y0, y1, x0, x1 = tile
+    top, left = max(0, y0 - halo), max(0, x0 - halo)
+    bottom, right = min(height, y1 + halo), min(width, x1 + halo)
+    return np.ascontiguousarray(source[top:bottom, left:right]), (y0 - top, x0 - left)
+
+
+def run_tiles(function, tiles, workers=None, progress=None, cancelled=None):
+    """Executa function(tile) para cada bloco em um pool de threads
+
+    Retorna os resultados na ordem dos blocos. progress(feitos, total) é
+    chamado a cada bloco concluído; se cancelled() retornar True, os blocos
+    restantes são abandonados e Cancelled é lançada.
+    """
+    results = [None] * len(tiles)
+
+    def run(index):
+        if cancelled is not None and cancelled():
+            raise Cancelled()
+        results[index] = function(tiles[index])
+
+    executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    try:
+        futures = [executor.submit(run, index) for index in range(len(tiles))]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if progress is not None:
+                progress(done, len(tiles))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+def process_tiles(function, source, output, halo=0, tile_size=DEFAULT_TILE_SIZE,
+                  workers=None, progress=None, cancelled=None):
+    """Aplica function a cada bloco de source (lido com halo) e grava o resultado em output
+
+    function recebe o bloco ampliado e retorna um resultado do mesmo tamanho
+    (altura e largura); só a parte sem halo é gravada. source e output podem
+    ser arrays em memória ou mapeados; os blocos gravam regiões disjuntas.
+    """
+    tiles, _, _ = tile_grid(source.shape, tile_size)
+
+    def process(tile):
+        block, (dy, dx) = read_block(source, tile, halo)
+        y0, y1, x0, x1 = tile
+        output[y0:y1, x0:x1] = function(block)[dy:dy + y1 - y0, dx:dx + x1 - x0]
+
+    run_tiles(process, tiles, workers, progress, cancelled)
+    return output
+
+
+def otsu_threshold(histogram):
+    """Limiar de Otsu de um histograma de 256 níveis (mesmo cálculo do cv2.THRESH_OTSU)"""
+    histogram = np.asarray(histogram, dtype=np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 0
+    epsilon = np.finfo(np.float32).eps
+    mean = float(np.dot(np.arange(256), histogram)) / total
+
+    q1 = mu1 = 0.0
+    best_sigma = 0.0
+    threshold = 0
+    for level in range(256):
+        p = histogram[level] / total
+        mu1 *= q1
+        q1 += p
+        q2 = 1.0 - q1
+        if min(q1, q2) < epsilon or max(q1, q2) > 1.0 - epsilon:
+            continue
+        mu1 = (mu1 + level * p) / q1
+        mu2 = (mean - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) ** 2
+        if sigma > best_sigma:
+            best_sigma = sigma
+            threshold = level
+    return threshold
+
+
+# =========================================================================
+# EXECUÇÃO EM FAIXAS PARALELAS (IMAGENS EM MEMÓRIA)
+# =========================================================================
+
+def strip_workers(workers=None):
+    """Threads para as faixas: workers, ou os núcleos que as threads do OpenCV deixam livres
+
+    Cada faixa chama o OpenCV, que já divide o trabalho entre
+    cv2.getNumThreads() threads; faixas em paralelo por cima disso só
+    disputariam os mesmos núcleos.
+    """
+    if workers:
+        return workers
+    return max(1, (os.cpu_count() or 1) // max(1, cv2.getNumThreads()))
+
+
+def strip_height(height, workers=None):
+    """Altura das faixas para dividir uma imagem entre workers threads"""
+    strips = max(MIN_STRIPS, strip_workers(workers) * STRIPS_PER_WORKER)
+    return max(MIN_STRIP_HEIGHT, -(-height // strips))
+
+
+def apply_in_strips(name, image, workers=None, progress=None, cancelled=None, **params):
+    """Aplica a operação name de ops.OPERATIONS em faixas horizontais processadas em paralelo
+
+    Cada faixa é lida com o halo da operação, então o resultado é igual ao de
+    ops.OPERATIONS[name](image, **params) (exceto pelo Canny, ver CANNY_HALO).
+    progress(feitos, total) é chamado a cada faixa; se cancelled() retornar
+    True, Cancelled é lançada.
+
+    Com uma única thread (ver strip_workers; com o OpenCV usando todos os
+    núcleos, o padrão) a operação é aplicada à imagem inteira em uma chamada.
+    Medido em 1 núcleo, 1080p, kernels de 5 a 31, as faixas rodavam a
+    0,45x-0,87x da velocidade da chamada única; sem um ganho medido, a aba de
+    imagem usa a chamada única.
+    """
+    if name == "binary":
+        # O limiar de Otsu depende da imagem inteira; a operação é ponto a ponto e rápida
+        return ops.to_binary(image)
+    operation = ops.OPERATIONS[name]
+    workers = strip_workers(workers)
+    if workers == 1:
+        if cancelled is not None and cancelled():
+            raise Cancelled()
+        result = operation(image, **params)
+        if progress is not None:
+            progress(1, 1)
+        return result
+    output = np.empty(output_shape(name, image.shape), image.dtype)
+    tile_size = (strip_height(image.shape[0], workers), image.shape[1])
+    return process_tiles(lambda block: operation(block, **params), image, output,
+                         halo_for(name, params), tile_size, workers, progress, cancelled)
+
+
+# =========================================================================
+# PROCESSADOR EM BLOCOS
+# =========================================================================
+
+class TiledProcessor:
+    """Operações e análises de image_operations aplicadas bloco a bloco
+
+    As imagens de entrada podem ser arrays em memória ou mapeados (open_image);
+    os resultados das operações são gravados em arquivos .npy mapeados.
+    """
+
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE, workers=None, progress=None, cancelled=None):
+        self.tile_size = tile_size
+        self.workers = workers
+        self.progress = progress  # progress(feitos, total) por bloco
+        self.cancelled = cancelled
+
+    def run(self, function, source, output, halo=0):
+        """process_tiles com as configurações do processador"""
+        return process_tiles(function, source, output, halo, self.tile_size,
+                             self.workers, self.progress, self.cancelled)
+
+    def map(self, function, source):
+        """function(bloco) para cada bloco sem halo; retorna (blocos, resultados, linhas, colunas)"""
+        tiles, rows, cols = tile_grid(source.shape, self.tile_size)
+        results = run_tiles(lambda tile: function(read_block(source, tile)[0]), tiles,
+                            self.workers, self.progress, self.cancelled)
+        return tiles, results, rows, cols
+
+    # ----- Operações -----
+
+    def histogram(self, source):
+        """Histograma dos tons de cinza da imagem inteira (256 níveis)"""
+        def tile_histogram(block):
+            gray = ops.to_grayscale(block)
+            return cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+
+        _, histograms, _, _ = self.map(tile_histogram, source)
+        return np.sum(histograms, axis=0)
+
+    def binarizer(self, source):
+        """Função que binariza um bloco como ops.ensure_binary binarizaria a imagem inteira"""
+        if source.ndim == 2:
+            _, maxima, _, _ = self.map(np.max, source)
+            if max(maxima) <= 1:
+                return lambda block: block  # Já é binária (0/1)
+        return self._otsu_binarizer(source)
+
+    def _otsu_binarizer(self, source):
+        threshold = otsu_threshold(self.histogram(source))
+        return lambda block: cv2.threshold(ops.to_grayscale(block), threshold, 255, cv2.THRESH_BINARY)[1]
+
+    def apply(self, name, source, output_path, **params):
+        """Aplica a operação name de ops.OPERATIONS; retorna o resultado mapeado em output_path"""
+        if name not in ops.OPERATIONS:
+            raise ValueError(f"Operação desconhecida: {name}")
+        output = create_image(output_path, output_shape(name, source.shape), source.dtype)
+        if name == "binary":
+            function = self._otsu_binarizer(source)
+        else:
+            operation = ops.OPERATIONS[name]
+            function = lambda block: operation(block, **params)
+        self.run(function, source, output, halo_for(name, params))
+        output.flush()
+        return output
+
+    def apply_operations(self, operations, source, output_path):
+        """Aplica uma sequência de operações (nomes de OPERATIONS); retorna o resultado mapeado
+
+        Os resultados intermediários vão para arquivos temporários no diretório
+        de output_path, removidos assim que deixam de ser necessários.
+        """
+        directory = os.path.dirname(os.path.abspath(output_path))
+        current = source
+        temporary = None
+        for index, name in enumerate(operations):
+            if index == len(operations) - 1:
+                path = output_path
+            else:
+                handle, path = tempfile.mkstemp(suffix=".npy", dir=directory)
+                os.close(handle)
+            result = self.apply(name, current, path)
+
+            # O intermediário anterior não é mais lido
+            current = result
+            if temporary is not None:
+                os.remove(temporary)
+            temporary = path if path != output_path else None
+        return current
+
+    # ----- Análises -----
+
+    def components(self, source, connectivity=8, binarize=None, foreground=None):
+        """Componentes conexos da imagem inteira, juntando os que atravessam as divisas
+
+        binarize(bloco) binariza cada bloco (padrão: binarizer(source)) e
+        foreground(binária) dá a máscara de objetos (padrão: pixels iguais a 255,
+        como ops.label_components). Retorna um dicionário com count, areas e
+        boxes (x0, y0, x1, y1 inclusivos), um item por componente.
+        """
+        if connectivity not in (4, 8):
+            raise ValueError("Conectividade deve ser 4 ou 8")
+        binarize = binarize or self.binarizer(source)
+        foreground = foreground or (lambda binary: binary == 255)
+
+        def label(block):
+            mask = foreground(binarize(block)).view(np.uint8)
+            count, labels, stats, _ = cv2.connectedComponentsWithStats(
+                mask, connectivity=connectivity, ltype=cv2.CV_32S)
+            # Só as bordas dos rótulos são guardadas, para juntar componentes vizinhos
+            edges = (labels[0].copy(), labels[-1].copy(), labels[:, 0].copy(), labels[:, -1].copy())
+            return count - 1, stats[1:], edges
+
+        tiles, results, rows, cols = self.map(label, source)
+
+        # Rótulo global de cada componente local: offset do bloco + rótulo - 1
+        counts = np.array([count for count, _, _ in results], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        total = int(offsets[-1])
+
+        def to_global(index, labels):
+            return np.where(labels > 0, labels.astype(np.int64) + offsets[index] - 1, -1)
+
+        pairs = []
+        for row in range(rows):
+            for col in range(cols):
+                index = row * cols + col
+                top, bottom, left, right = results[index][2]
+                if col + 1 < cols:
+                    neighbor = results[index + 1][2][2]  # Coluna esquerda do bloco à direita
+                    pairs.append(_seam_pairs(to_global(index, right), to_global(index + 1, neighbor),
+                                             connectivity))
+                if row + 1 < rows:
+                    neighbor = results[index + cols][2][0]  # Linha de cima do bloco abaixo
+                    pairs.append(_seam_pairs(to_global(index, bottom), to_global(index + cols, neighbor),
+                                             connectivity))
+                if connectivity == 8 and row + 1 < rows and col + 1 < cols:
+                    # Cantos: diagonais entre blocos que só se tocam em um pixel
+                    pairs.append(np.array([[to_global(index, bottom[-1:])[0],
+                                            to_global(index + cols + 1, results[index + cols + 1][2][0][:1])[0]],
+                                           [to_global(index + 1, results[index + 1][2][1][:1])[0],
+                                            to_global(index + cols, results[index + cols][2][0][-1:])[0]]]))
+
+        roots = _merge(total, np.concatenate(pairs) if pairs else np.empty((0, 2), np.int64))
+        unique_roots, component = np.unique(roots, return_inverse=True)
+        count = len(unique_roots)
+
+        # Áreas e caixas em coordenadas globais, somadas por componente
+        stats = np.concatenate([s for _, s, _ in results]) if total else np.empty((0, 5), np.int32)
+        origin_x = np.concatenate([np.full(c, tile[2]) for c, tile in zip(counts, tiles)]) if total else []
+        origin_y = np.concatenate([np.full(c, tile[0]) for c, tile in zip(counts, tiles)]) if total else []
+        x0 = stats[:, cv2.CC_STAT_LEFT] + origin_x
+        y0 = stats[:, cv2.CC_STAT_TOP] + origin_y
+        x1 = x0 + stats[:, cv2.CC_STAT_WIDTH] - 1
+        y1 = y0 + stats[:, cv2.CC_STAT_HEIGHT] - 1
+
+        areas = np.bincount(component, weights=stats[:, cv2.CC_STAT_AREA], minlength=count).astype(np.int64)
+        boxes = np.empty((count, 4), np.int64)
+        boxes[:, :2] = np.iinfo(np.int64).max
+        boxes[:, 2:] = -1
+        np.minimum.at(boxes[:, 0], component, x0)
+        np.minimum.at(boxes[:, 1], component, y0)
+        np.maximum.at(boxes[:, 2], component, x1)
+        np.maximum.at(boxes[:, 3], component, y1)
+        return {"count": count, "areas": areas, "boxes": boxes}
+
+    def count_objects(self, source, connectivity=8):
+        """Mesmo resultado de ops.count_objects sobre a imagem inteira"""
+        return self.components(source, connectivity)["count"]
+
+    def calculate_metrics(self, source):
+        """Mesmo resultado de ops.calculate_metrics sobre a imagem inteira
+
+        O maior contorno é procurado entre os componentes em ordem decrescente
+        do limite superior da área do contorno ((largura - 1) x (altura - 1) da
+        caixa), lendo só a caixa de cada candidato; a busca para quando nenhum
+        candidato restante pode superar o melhor encontrado. A caixa do maior
+        objeto precisa caber na memória.
+        """
+        binarize = self.binarizer(source)
+        # findContours considera objeto qualquer pixel diferente de zero
+        foreground = lambda binary: binary != 0
+        components = self.components(source, 8, binarize, foreground)
+        if components["count"] == 0:
+            return None
+
+        boxes = components["boxes"]
+        bounds = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        best = None
+        for index in np.argsort(-bounds, kind="stable"):
+            if best is not None and bounds[index] <= best[0]:
+                break
+            x0, y0, x1, y1 = boxes[index]
+            block = np.ascontiguousarray(source[y0:y1 + 1, x0:x1 + 1])
+            contour = _component_contour(foreground(binarize(block)).view(np.uint8),
+                                         components["areas"][index])
+            area = cv2.contourArea(contour)
+            if best is None or area > best[0]:
+                best = (area, contour)
+
+        area, contour = best
+        return {"area": area, "perimeter": cv2.arcLength(contour, True),
+                "diameter": 2 * np.sqrt(area / np.pi)}
+
+
+def _seam_pairs(a, b, connectivity):
+    """Pares (rótulo global de a, de b) de objetos vizinhos através de uma divisa
+
+    a e b são as linhas (ou colunas) de pixels dos dois lados da divisa, com
+    -1 no fundo.
+    """
+    candidates = [(a, b)]
+    if connectivity == 8:
+        candidates += [(a[:-1], b[1:]), (a[1:], b[:-1])]
+    pairs = [np.stack((left[(left >= 0) & (right >= 0)], right[(left >= 0) & (right >= 0)]), axis=1)
+             for left, right in candidates]
+    return np.concatenate(pairs)
+
+
+def _merge(total, pairs):
+    """Raiz de cada um dos total rótulos depois de unir os pares (union-find)"""
+    roots = np.arange(total, dtype=np.int64)
+    pairs = pairs[(pairs >= 0).all(axis=1)]
+    if not len(pairs):
+        return roots
+    parent = {}
+
+    def find(label):
+        root = label
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while label != root:  # Compressão de caminho
+            parent[label], label = root, parent[label]
+        return root
+
+    for a, b in np.unique(pairs, axis=0).tolist():
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    for label in parent:
+        roots[label] = find(label)
+    return roots
+
+
+def _component_contour(mask, area):
+    """Contorno externo do componente que ocupa toda a caixa de mask e tem a área dada
+
+    Outros objetos podem invadir a caixa; o componente procurado é o que
+    tem a mesma caixa e a mesma área.
+    """
+    height, width = mask.shape
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8, ltype=cv2.CV_32S)
+    matches = np.flatnonzero((stats[1:, cv2.CC_STAT_LEFT] == 0) & (stats[1:, cv2.CC_STAT_TOP] == 0) &
+                             (stats[1:, cv2.CC_STAT_WIDTH] == width) &
+                             (stats[1:, cv2.CC_STAT_HEIGHT] == height) &
+                             (stats[1:, cv2.CC_STAT_AREA] == area)) + 1
+    best = None
+    for label in matches:
+        contours, _ = cv2.findContours((labels == label).view(np.uint8), cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea)
+        if best is None or cv2.contourArea(contour) > cv2.contourArea(best):
+            best = contour
+    return best
+
+
+# =========================================================================
+# LINHA DE COMANDO
+# =========================================================================
+
+def parse_shape(value):
+    """Converte 'AxL' ou 'AxLxC' em tupla de inteiros"""
+    try:
+        shape = tuple(int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Formato inválido: {value} (use AxL ou AxLxC)")
+    if len(shape) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Formato inválido: {value} (use AxL ou AxLxC)")
+    return shape
+
+
+def print_progress(done, total):
+    """Mostra o progresso por bloco na mesma linha do terminal"""
+    print(f"\r  {done}/{total} blocos", end="", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processamento em blocos de imagens grandes")
+    parser.add_argument("input", help="Imagem de entrada: .npy, raw (com --shape) ou arquivo de imagem")
+    parser.add_argument("output", help="Arquivo .npy de saída")
+    parser.add_argument("--ops", default="",
+                        help=f"Cadeia de operações separadas por vírgula ({', '.join(ops.OPERATIONS)})")
+    parser.add_argument("--analyses", default="",
+                        help=f"Análises a executar no resultado ({', '.join(ops.ANALYSES)})")
+    parser.add_argument("--shape", type=parse_shape, default=None,
+                        help="Formato de uma entrada raw (ex.: 60000x80000x3)")
+    parser.add_argument("--dtype", default="uint8", help="Tipo dos pixels de uma entrada raw")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE,
+                        help=f"Lado dos blocos em pixels (padrão: {DEFAULT_TILE_SIZE})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Threads de processamento (padrão: número de núcleos)")
+    args = parser.parse_args(argv)
+
+    operations = [name.strip() for name in args.ops.split(",") if name.strip()]
+    analyses = [name.strip() for name in args.analyses.split(",") if name.strip()]
+    invalid = [name for name in operations if name not in ops.OPERATIONS]
+    invalid += [name for name in analyses if name not in ops.ANALYSES]
+    if invalid:
+        parser.error(f"Desconhecida(s): {', '.join(invalid)}")
+    if not operations and not analyses:
+        parser.error("Informe ao menos uma operação (--ops) ou análise (--analyses)")
+
+    imported = None
+    try:
+        if args.input.lower().endswith(".npy") or args.shape is not None:
+            source = open_image(args.input, args.shape, np.dtype(args.dtype))
+        else:
+            # Arquivo de imagem comum: convertido uma vez para .npy ao lado da saída
+            imported = os.path.splitext(args.output)[0] + ".entrada.npy"
+            print(f"Convertendo {args.input} para {imported}...")
+            source = import_image(args.input, imported)
+    except (IOError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+
+    processor = TiledProcessor(args.tile_size, args.workers, progress=print_progress)
+    print(f"Imagem {'x'.join(str(n) for n in source.shape)} em blocos de {args.tile_size} px")
+
+    start = time.perf_counter()
+    result = source
+    if operations:
+        print(f"Aplicando {', '.join(operations)}...")
+        result = processor.apply_operations(operations, source, args.output)
+        print(f"\n  Resultado salvo em {args.output}")
+
+    for name in analyses:
+        print(f"Análise {name}...")
+        value = processor.calculate_metrics(result) if name == "metrics" else processor.count_objects(result)
+        print(f"\n  {name}: {value}")
+
+    print(f"Concluído em {time.perf_counter() - start:.1f}s")
+    if imported is not None:
+        del source, result
+        os.remove(imported)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Exibição de frames de vídeo em um Label do Tk
+
+FrameOutput escolhe, por loop de vídeo, para onde vão os frames: o Label do
+Tk, uma janela do OpenCV ou nenhum lugar (sem exibição), de forma que cada
+frame pague por no máximo um caminho de exibição.
+
+TkFrameRenderer mantém uma única PhotoImage por Label e a atualiza no lugar
+(paste) a partir de buffers RGBA pré-alocados, em vez de criar PIL Image e
+PhotoImage novas a cada frame. submit() pode ser chamado de qualquer thread:
+o frame é redimensionado e convertido na thread chamadora e o desenho é
+agendado na thread do Tk (via UiDispatcher). Se vários frames chegarem antes
+do desenho, só o mais recente é exibido.
+"""
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+# Tamanho máximo exibido (o frame é reduzido mantendo a proporção)
+MAX_DISPLAY_SIZE = (800, 600)
+
+# Saídas de vídeo disponíveis
+SINK_TK = "tk"
+SINK_OPENCV = "opencv"
+SINK_NONE = "none"
+SINKS = (SINK_TK, SINK_OPENCV, SINK_NONE)
+
+
+class UiDispatcher:
+    """Executa chamadas na thread do Tk a partir de qualquer thread
+
+    Uma chamada ao Tk feita de outra thread fica bloqueada até a thread
+    principal processá-la; se a thread principal estiver esperando essa
+    outra thread (join), as duas travam. Por isso as threads de vídeo só
+    enfileiram a chamada, sem tocar no Tk, e a thread principal esvazia a
+    fila a cada interval_ms com root.after. Deve ser criado na thread do Tk.
+    """
+
+    def __init__(self, root, interval_ms=10):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._main_thread = threading.current_thread()
+        self._closed = False
+        self.root.after(interval_ms, self._drain)
+
+    def call(self, function, *args):
+        """Executa function(*args) na thread do Tk (na hora, se já estiver nela)"""
+        if threading.current_thread() is self._main_thread:
+            function(*args)
+        else:
+            self._queue.put((function, args))
+
+    def _drain(self):
+        while True:
+            try:
+                function, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"Erro em chamada da interface: {e}")
+        if not self._closed:
+            self.root.after(self.interval_ms, self._drain)
+
+    def close(self):
+        """Para de esvaziar a fila (ao fechar a janela)"""
+        self._closed = True
+
+
+class TkFrameRenderer:
+    """Desenha frames BGR (ou em tons de cinza) em um Label, sem recriar a PhotoImage
+
+    O desenho é feito na thread do Tk por meio de ui (UiDispatcher).
+
+    São usados três buffers RGBA em rodízio: um sendo desenhado pelo Tk, um
+    pendente e um sendo preenchido. O frame recebido é copiado (convertido)
+    antes de submit() retornar, então o chamador pode reaproveitar o buffer
+    do frame em seguida (ex.: buffers de pool).
+
+    RGBA é usado porque Image.frombuffer compartilha a memória nesse modo;
+    em RGB a PIL faria uma cópia a cada frame.
+    """
+
+    SLOTS = 3
+
+    def __init__(self, ui, label, max_size=MAX_DISPLAY_SIZE):
+        self.ui = ui  # UiDispatcher
+        self.label = label
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._convert_lock = threading.Lock()
+        self._size = None  # (largura, altura) exibidos
+        self._buffers = []
+        self._resized = None
+        self._images = []  # Image da PIL sobre cada buffer (memória compartilhada)
+        self._pending = None  # Índice do buffer aguardando desenho
+        self._drawing = None  # Índice do buffer sendo desenhado
+        self._scheduled = False
+        self.photo = None
+        self.dropped_frames = 0  # Frames substituídos antes de serem desenhados
+
+    def _display_size(self, frame):
+        """Tamanho exibido: o do frame, reduzido para caber em max_size"""
+        h, w = frame.shape[:2]
+        max_width, max_height = self.max_size
+        if w > max_width or h > max_height:
+            scale = min(max_width / w, max_height / h)
+            return int(w * scale), int(h * scale)
+        return w, h
+
+    def _allocate(self, size):
+        """(Re)cria os buffers para o tamanho exibido; chamado com _lock"""
+        width, height = size
+        self._size = size
+        self._buffers = [np.empty((height, width, 4), np.uint8) for _ in range(self.SLOTS)]
+        self._images = [Image.frombuffer("RGBA", size, buffer, "raw", "RGBA", 0, 1)
+                        for buffer in self._buffers]
+        self._resized = None
+        self._pending = None
+        self._drawing = None
+
+    def submit(self, frame):
+        """Converte o frame para exibição e agenda o desenho na thread do Tk"""
+        if frame is None:
+            return
+
+        size = self._display_size(frame)
+        with self._convert_lock:
+            with self._lock:
+                if size != self._size:
+                    self._allocate(size)
+                # Buffer livre: nem pendente nem sendo desenhado
+                index = next(i for i in range(self.SLOTS) if i not in (self._pending, self._drawing))
+                buffer = self._buffers[index]
+
+            source = frame
+            if size != (frame.shape[1], frame.shape[0]):
+                if self._resized is None or self._resized.shape != (size[1], size[0]) + frame.shape[2:]:
+                    self._resized = np.empty((size[1], size[0]) + frame.shape[2:], frame.dtype)
+                source = cv2.resize(frame, size, dst=self._resized)
+            code = cv2.COLOR_GRAY2RGBA if source.ndim == 2 else cv2.COLOR_BGR2RGBA
+            cv2.cvtColor(source, code, dst=buffer)
+
+            with self._lock:
+                if self._size != size:
+                    return  # Buffers recriados durante a conversão
+                if self._pending is not None:
+                    self.dropped_frames += 1
+                self._pending = index
+                schedule = not self._scheduled
+                self._scheduled = True
+
+        if schedule:
+            self.ui.call(self._draw)
+
+    def _draw(self):
+        """Desenha o frame pendente mais recente (executado na thread do Tk)"""
+        with self._lock:
+            self._scheduled = False
+            index = self._pending
+            if index is None:
+                return
+            self._pending = None
+            self._drawing = index
+            image = self._images[index]
+
+        try:
+            if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+                self.photo = ImageTk.PhotoImage("RGBA", image.size)
+                self.label.configure(image=self.photo, text="")
+                self.label.image = self.photo
+            self.photo.paste(image)
+        finally:
+            with self._lock:
+                self._drawing = None
+
+    def clear(self, **label_options):
+        """Descarta o frame exibido e o pendente; label_options vão para label.configure
+
+        Deve ser chamado na thread do Tk.
+        """
+        with self._lock:
+            self._pending = None
+        self.photo = None
+        self.label.configure(image="", **label_options)
+        self.label.image = None
+
+
+class FrameOutput:
+    """Saída de frames de um loop de vídeo
+
+    show(frame) exibe o frame na saída escolhida e wait(delay_ms) faz a
+    cadência entre frames. Só a saída SINK_OPENCV usa cv2.imshow/cv2.waitKey
+    (necessários para a janela do OpenCV processar eventos); nas demais a
+    espera é um time.sleep e a parada fica a cargo da interface (teclas do Tk
+    ou botão).
+    """
+
+    def __init__(self, sink, renderer=None, window_name="Vídeo"):
+        if sink not in SINKS:
+            raise ValueError(f"Saída de vídeo inválida: {sink}")
+        if sink == SINK_TK and renderer is None:
+            raise ValueError("A saída Tk precisa de um TkFrameRenderer")
+        self.sink = sink
+        self.renderer = renderer
+        self.window_name = window_name
+
+    def show(self, frame):
+        """Exibe o frame (na saída Tk ele é convertido antes de retornar)"""
+        if self.sink == SINK_TK:
+            self.renderer.submit(frame)
+        elif self.sink == SINK_OPENCV:
+            cv2.imshow(self.window_name, frame)
+
+    def wait(self, delay_ms=1):
+        """Aguarda delay_ms; retorna False se 'q' foi pressionado na janela do OpenCV
+
+        Atrasos de até 1 ms são ignorados fora da janela do OpenCV (servem
+        apenas para o waitKey processar eventos).
+        """
+        if self.sink == SINK_OPENCV:
+            return cv2.waitKey(max(1, int(delay_ms))) & 0xFF != ord('q')
+        if delay_ms > 1:
+            time.sleep(delay_ms / 1000)
+        return True
+
+    def close(self):
+        """Fecha a janela do OpenCV, se usada"""
+        if self.sink == SINK_OPENCV:
+            try:
+                cv2.destroyWindow(self.window_name)
+            except cv2.error:
+                pass  # Janela já fechada pelo usuário
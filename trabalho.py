@@ -1,14 +1,27 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
 import matplotlib.pyplot as plt
 import pygame
 import os
-import threading
 import time
 
+import image_operations as ops
+from detectors import FaceEyeDetector, MicrophoneDetector
+from video_pipeline import (VideoPipeline, DROP_OLDEST, BLOCK, MAX_FRAMES_IN_FLIGHT, render_video_to_file,
+                            WorkerManager)
+from instrumentation import StageProfiler
+from history import ImageHistory, ORIGINAL, proxy_image, rebuild_history
+from result_cache import ResultCache
+from tk_display import UiDispatcher, TkFrameRenderer, FrameOutput, SINK_TK, SINK_OPENCV, SINK_NONE
+
+# Tempo máximo (s) que stop_video espera o loop de vídeo terminar
+STOP_TIMEOUT = 2.0
+
+# Aviso das análises feitas sobre a cópia reduzida da edição rápida
+PROXY_ANALYSIS_NOTE = "Calculado na cópia reduzida; aplique em resolução total para valores exatos."
+
 class ImageVideoProcessor:
     def __init__(self, root):
         self.root = root
@@ -21,6 +34,13 @@ class ImageVideoProcessor:
         # Variáveis de estado
         self.current_image = None
         self.original_image = None
+        # Resultados de operações/análises por conteúdo da imagem, compartilhados com o histórico
+        self.results = ResultCache()
+        self.history = ImageHistory(cache=self.results)  # Passos aplicados à imagem (desfazer/refazer)
+        # Edição rápida: o histórico trabalha sobre uma cópia reduzida e a
+        # resolução total é calculada em segundo plano (image_jobs)
+        self.proxy_mode = False
+        self.image_jobs = WorkerManager()
         self.video_capture = None
         self.is_video = False
         self.video_playing = False
@@ -30,6 +50,18 @@ class ImageVideoProcessor:
         self.tracking_active = False
         self.detection_active = False
         self.sound_playing = False
+        self.frame_chains = {}  # Cadeias de operações compiladas para vídeo
+        self.frame_pool = ops.BufferPool()  # Buffers reutilizados entre frames
+        # Motores de detecção, criados na primeira execução e reaproveitados
+        self.face_engine = None
+        self.microphone_engine = None
+        # Tempos por estágio do loop de vídeo em execução
+        self.profiler = StageProfiler()
+        self.show_overlay = False
+        self.output_sink = SINK_TK  # Onde os loops de vídeo exibem os frames
+        # Loop de vídeo ativo (no máximo um) e chamadas das threads para a interface
+        self.workers = WorkerManager()
+        self.ui = UiDispatcher(self.root)
         
         # Configurar estilo
         self.setup_styles()
@@ -37,6 +69,12 @@ class ImageVideoProcessor:
         # Criar interface
         self.create_widgets()
         
+        # Parar o vídeo pelo teclado sem depender do cv2.waitKey
+        self.root.bind("<KeyPress>", self.on_key_press)
+        # Desfazer/refazer na aba de imagem
+        self.root.bind("<Control-z>", lambda event: self.on_history_key(event, self.undo_image))
+        self.root.bind("<Control-y>", lambda event: self.on_history_key(event, self.redo_image))
+        
     def setup_styles(self):
         """Configura os estilos da interface"""
         self.style = ttk.Style()
@@ -87,6 +125,36 @@ class ImageVideoProcessor:
         ttk.Button(file_frame, text="Salvar Imagem", 
                   command=self.save_image).pack(fill=tk.X, pady=2)
         
+        # ===== HISTÓRICO =====
+        history_frame = ttk.LabelFrame(control_frame, text="Histórico", padding=10)
+        history_frame.pack(fill=tk.X, pady=5)
+        
+        self.undo_button = ttk.Button(history_frame, text="Desfazer (Ctrl+Z)", 
+                                      command=self.undo_image, state=tk.DISABLED)
+        self.undo_button.pack(fill=tk.X, pady=2)
+        self.redo_button = ttk.Button(history_frame, text="Refazer (Ctrl+Y)", 
+                                      command=self.redo_image, state=tk.DISABLED)
+        self.redo_button.pack(fill=tk.X, pady=2)
+        
+        # ===== EDIÇÃO RÁPIDA =====
+        proxy_frame = ttk.LabelFrame(control_frame, text="Edição Rápida", padding=10)
+        proxy_frame.pack(fill=tk.X, pady=5)
+        
+        self.proxy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(proxy_frame, text="Editar em resolução reduzida", variable=self.proxy_var,
+                        command=self.toggle_proxy_mode).pack(anchor=tk.W, pady=2)
+        ttk.Button(proxy_frame, text="Aplicar em Resolução Total", 
+                  command=self.apply_full_resolution).pack(fill=tk.X, pady=2)
+        
+        # ===== PROCESSAMENTO EM SEGUNDO PLANO =====
+        job_frame = ttk.LabelFrame(control_frame, text="Processamento", padding=10)
+        job_frame.pack(fill=tk.X, pady=5)
+        
+        self.image_progress = ttk.Progressbar(job_frame, maximum=100, mode='determinate')
+        self.image_progress.pack(fill=tk.X, pady=2)
+        ttk.Button(job_frame, text="Cancelar Processamento", 
+                  command=self.cancel_image_job).pack(fill=tk.X, pady=2)
+        
         # ===== CONVERSÕES =====
         convert_frame = ttk.LabelFrame(control_frame, text="Conversões", padding=10)
         convert_frame.pack(fill=tk.X, pady=5)
@@ -203,6 +271,17 @@ class ImageVideoProcessor:
         ttk.Button(morph_frame, text="Fechamento", 
                   command=lambda: self.apply_video_operation("closing")).pack(fill=tk.X, pady=2)
         
+        # ===== CADEIA DE OPERAÇÕES PARA VÍDEO =====
+        chain_frame = ttk.LabelFrame(control_frame, text="Cadeia de Operações", padding=10)
+        chain_frame.pack(fill=tk.X, pady=5)
+        
+        self.chain_var = tk.StringVar(value="grayscale,median,binary,opening")
+        ttk.Entry(chain_frame, textvariable=self.chain_var).pack(fill=tk.X, pady=2)
+        ttk.Button(chain_frame, text="Aplicar Cadeia", 
+                  command=self.apply_video_chain).pack(fill=tk.X, pady=2)
+        ttk.Button(chain_frame, text="Exportar Vídeo Processado", 
+                  command=self.export_processed_video).pack(fill=tk.X, pady=2)
+        
         # ===== OPERAÇÕES ESPECÍFICAS DE VÍDEO =====
         video_ops_frame = ttk.LabelFrame(control_frame, text="Operações de Vídeo", padding=10)
         video_ops_frame.pack(fill=tk.X, pady=5)
@@ -214,10 +293,31 @@ class ImageVideoProcessor:
         ttk.Button(video_ops_frame, text="Reproduzir Vídeo Normal", 
                   command=self.play_video_normal).pack(fill=tk.X, pady=2)
         
+        # ===== SAÍDA DE VÍDEO =====
+        output_frame = ttk.LabelFrame(control_frame, text="Saída de Vídeo", padding=10)
+        output_frame.pack(fill=tk.X, pady=5)
+        
+        self.sink_var = tk.StringVar(value=SINK_TK)
+        for text, sink in (("Interface", SINK_TK), ("Janela OpenCV", SINK_OPENCV), ("Nenhuma", SINK_NONE)):
+            ttk.Radiobutton(output_frame, text=text, value=sink, variable=self.sink_var,
+                            command=self.select_output_sink).pack(fill=tk.X, pady=1)
+        
+        # ===== DESEMPENHO =====
+        performance_frame = ttk.LabelFrame(control_frame, text="Desempenho", padding=10)
+        performance_frame.pack(fill=tk.X, pady=5)
+        
+        self.overlay_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(performance_frame, text="Mostrar FPS/Latência", variable=self.overlay_var,
+                        command=self.toggle_overlay).pack(fill=tk.X, pady=2)
+        ttk.Button(performance_frame, text="Exportar Métricas", 
+                  command=self.export_metrics).pack(fill=tk.X, pady=2)
+        
         # ===== ÁREA DE EXIBIÇÃO DO VÍDEO =====
         self.video_label = ttk.Label(display_frame, text="Vídeo será exibido aqui\n\nUse 'Carregar Vídeo' ou 'Acessar Câmera' para começar", 
                                    background='black', anchor=tk.CENTER, foreground='white', justify=tk.CENTER)
         self.video_label.pack(fill=tk.BOTH, expand=True)
+        # Frames de vídeo são desenhados na thread do Tk, reaproveitando a mesma PhotoImage
+        self.video_renderer = TkFrameRenderer(self.ui, self.video_label)
         
         # ===== BARRA DE STATUS DO VÍDEO =====
         self.video_status_var = tk.StringVar()
@@ -245,12 +345,19 @@ class ImageVideoProcessor:
                 # Ler a imagem usando OpenCV
                 self.original_image = cv2.imread(file_path)
                 if self.original_image is not None:
-                    self.current_image = self.original_image.copy()
+                    # Processamento em resolução total da imagem anterior não serve mais
+                    self.image_jobs.stop()
+                    
+                    # O histórico compartilha o original (somente leitura) em vez de
+                    # copiá-lo; na edição rápida ele parte da cópia reduzida
+                    working_image = proxy_image(self.original_image) if self.proxy_mode else self.original_image
+                    self.current_image = self.history.reset(working_image)
+                    self.update_history_buttons()
                     self.is_video = False
                     
                     # Exibir informações da imagem
-                    height, width = self.current_image.shape[:2]
-                    channels = self.current_image.shape[2] if len(self.current_image.shape) == 3 else 1
+                    height, width = self.original_image.shape[:2]
+                    channels = self.original_image.shape[2] if len(self.original_image.shape) == 3 else 1
                     
                     self.display_image(self.current_image)
                     self.status_var.set(f"Imagem carregada: {os.path.basename(file_path)} - {width}x{height} - {channels} canal(is)")
@@ -349,66 +456,80 @@ class ImageVideoProcessor:
             messagebox.showwarning("Aviso", "Nenhum vídeo carregado ou câmera não acessada")
             return
         
-        # Se for um arquivo de vídeo, voltar ao início
-        if self.current_video_path != "camera":
-            self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        capture = self.video_capture
+        is_camera = self.current_video_path == "camera"
+        self.video_status_var.set("Reproduzindo vídeo - Pressione 'Q' para parar")
         
-        self.video_playing = True
-        self.video_status_var.set("Reproduzindo vídeo - Pressione 'Q' na janela para parar")
+        profiler = self.profiler
+        output = self.create_video_output("Reprodução de Vídeo")
         
-        def video_loop():
+        def video_loop(worker):
             """Loop principal de reprodução de vídeo"""
-            while self.video_playing and self.video_capture.isOpened():
-                ret, frame = self.video_capture.read()
+            # Executado só depois que o loop anterior terminou de usar a captura
+            self.video_playing = True
+            profiler.reset()
+            
+            # Se for um arquivo de vídeo, voltar ao início
+            if not is_camera:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            
+            while not worker.cancelled and capture.isOpened():
+                started = time.perf_counter()
+                with profiler.stage("capture"):
+                    ret, frame = capture.read()
                 
                 if ret:
-                    # Exibir o frame
-                    self.display_video_frame(frame)
-                    
-                    # Adicionar informações no frame se for uma janela separada
-                    if self.current_video_path == "camera":
-                        cv2.putText(frame, "Câmera - Pressione Q para sair", (10, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    else:
-                        current_frame = int(self.video_capture.get(cv2.CAP_PROP_POS_FRAMES))
-                        total_frames = int(self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
-                        cv2.putText(frame, f"Frame: {current_frame}/{total_frames} - Pressione Q para sair", 
-                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    # Adicionar informações no frame
+                    with profiler.stage("draw"):
+                        if is_camera:
+                            cv2.putText(frame, "Câmera - Pressione Q para sair", (10, 30), 
+                                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                        else:
+                            current_frame = int(capture.get(cv2.CAP_PROP_POS_FRAMES))
+                            total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+                            cv2.putText(frame, f"Frame: {current_frame}/{total_frames} - Pressione Q para sair", 
+                                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                        if self.show_overlay:
+                            profiler.draw_overlay(frame)
                     
-                    # Mostrar em uma janela separada do OpenCV
-                    cv2.imshow("Reprodução de Vídeo", frame)
+                    # Exibir o frame na saída escolhida (interface ou janela do OpenCV)
+                    with profiler.stage("display"):
+                        output.show(frame)
                     
                     # Controlar a velocidade de reprodução
-                    if self.current_video_path == "camera":
+                    if is_camera:
                         delay = 1  # Câmera em tempo real
                     else:
-                        fps = self.video_capture.get(cv2.CAP_PROP_FPS)
+                        fps = capture.get(cv2.CAP_PROP_FPS)
                         delay = max(1, int(1000 / fps)) if fps > 0 else 30
                     
-                    # Verificar se o usuário pressionou 'q' para sair
-                    if cv2.waitKey(delay) & 0xFF == ord('q'):
+                    # Aguardar o próximo frame e verificar se o usuário pressionou 'q'
+                    # (na janela do OpenCV; na interface a tecla é tratada pelo Tk)
+                    with profiler.stage("waitkey"):
+                        keep_going = output.wait(delay)
+                    profiler.frame_done(time.perf_counter() - started)
+                    if not keep_going:
                         break
                 else:
                     # Fim do vídeo (apenas para arquivos)
-                    if self.current_video_path != "camera":
+                    if not is_camera:
                         break
             
             # Limpar após o loop
-            cv2.destroyAllWindows()
+            output.close()
             self.video_playing = False
-            self.video_status_var.set("Reprodução finalizada")
+            self.set_video_status("Reprodução finalizada")
             
-            # Se era um arquivo de vídeo, resetar para o início
-            if self.current_video_path != "camera" and self.video_capture:
-                self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = self.video_capture.read()
+            # Se era um arquivo de vídeo, resetar para o início (a menos que
+            # o loop tenha sido cancelado para parar o vídeo ou iniciar outro)
+            if not is_camera and not worker.cancelled:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = capture.read()
                 if ret:
                     self.display_video_frame(frame)
         
-        # Executar o loop de vídeo em uma thread separada
-        video_thread = threading.Thread(target=video_loop)
-        video_thread.daemon = True
-        video_thread.start()
+        # Executar o loop de vídeo em uma thread separada (substituindo o loop atual)
+        self.workers.start(video_loop, "reproducao")
 
     # =========================================================================
     # CONVERSÕES BÁSICAS IMPLEMENTADAS (IMAGEM, VÍDEO E CÂMERA)
@@ -418,9 +539,7 @@ class ImageVideoProcessor:
         """Método para converter para tons de cinza - IMPLEMENTADO"""
         if self.current_image is not None and not self.is_video:
             # Converter para tons de cinza
-            if len(self.current_image.shape) == 3:
-                self.current_image = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-            self.display_image(self.current_image)
+            self.apply_image_step("grayscale", "Tons de Cinza")
             self.status_var.set("Imagem convertida para tons de cinza")
         elif self.is_video:
             messagebox.showinfo("Info", "Use as conversões de vídeo na aba de Vídeo para processar vídeos")
@@ -431,8 +550,7 @@ class ImageVideoProcessor:
         """Método para converter para negativo - IMPLEMENTADO"""
         if self.current_image is not None and not self.is_video:
             # Converter para negativo
-            self.current_image = 255 - self.current_image
-            self.display_image(self.current_image)
+            self.apply_image_step("negative", "Negativo")
             self.status_var.set("Imagem convertida para negativo")
         elif self.is_video:
             messagebox.showinfo("Info", "Use as conversões de vídeo na aba de Vídeo para processar vídeos")
@@ -443,32 +561,82 @@ class ImageVideoProcessor:
         """Método para converter para binária (Otsu) - IMPLEMENTADO"""
         if self.current_image is not None and not self.is_video:
             # Converter para binária usando método de Otsu
-            if len(self.current_image.shape) == 3:
-                gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = self.current_image
-            
-            # Aplicar limiarização de Otsu
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            self.current_image = binary
-            self.display_image(self.current_image)
+            self.apply_image_step("binary", "Binária (Otsu)")
             self.status_var.set("Imagem convertida para binária (Otsu)")
         elif self.is_video:
             messagebox.showinfo("Info", "Use as conversões de vídeo na aba de Vídeo para processar vídeos")
         else:
             messagebox.showwarning("Aviso", "Nenhuma imagem carregada para processar")
     
+    def parse_video_chain(self):
+        """Lê a cadeia de operações digitada (ex.: grayscale,median,binary); None se inválida"""
+        steps = [name.strip() for name in self.chain_var.get().split(",") if name.strip()]
+        invalid = [name for name in steps if name not in ops.OPERATIONS]
+        
+        if not steps or invalid:
+            messagebox.showerror("Erro", f"Cadeia inválida: {', '.join(invalid) or 'vazia'}\n\n"
+                                         f"Operações disponíveis: {', '.join(ops.OPERATIONS)}")
+            return None
+        
+        return steps
+    
+    def apply_video_chain(self):
+        """Aplica em vídeo a cadeia de operações digitada"""
+        steps = self.parse_video_chain()
+        if steps is not None:
+            self.apply_video_operation(steps)
+    
+    def export_processed_video(self):
+        """Exporta o vídeo carregado com a cadeia de operações, sem exibição e sem limite de FPS"""
+        if self.current_video_path is None or self.current_video_path == "camera":
+            messagebox.showwarning("Aviso", "Carregue um arquivo de vídeo para exportar")
+            return
+        
+        steps = self.parse_video_chain()
+        if steps is None:
+            return
+        
+        output_path = filedialog.asksaveasfilename(
+            title="Exportar Vídeo Processado",
+            defaultextension=".mp4",
+            filetypes=[
+                ("MP4", "*.mp4"),
+                ("AVI", "*.avi"),
+                ("Todos os arquivos", "*.*")
+            ]
+        )
+        if not output_path:
+            return
+        
+        input_path = self.current_video_path
+        
+        def progress(done, total, fps):
+            self.set_video_status(f"Exportando: {done}/{total} frames - {fps:.1f} frames/s")
+        
+        def export_loop(worker):
+            """Processa e grava o vídeo inteiro em segundo plano (Parar Vídeo interrompe)"""
+            try:
+                stats = render_video_to_file(input_path, output_path, steps, progress=progress,
+                                             stop_event=worker.cancel_event)
+            except Exception as e:
+                self.set_video_status(f"Erro na exportação: {e}")
+                return
+            if worker.cancelled:
+                self.set_video_status(f"Exportação interrompida: {stats['frames']} frames gravados")
+            else:
+                self.set_video_status(f"Exportação concluída: {stats['frames']} frames em "
+                                      f"{stats['seconds']:.1f}s ({stats['fps']:.1f} frames/s)")
+        
+        # Como os loops de vídeo, substitui o loop atual e é cancelada por stop_video
+        self.workers.start(export_loop, "exportacao")
+    
     def apply_video_operation(self, operation):
-        """Método para aplicar operação em vídeo - IMPLEMENTADO"""
+        """Método para aplicar operação (ou cadeia de operações) em vídeo - IMPLEMENTADO"""
         if self.video_capture is None or not self.video_capture.isOpened():
             messagebox.showwarning("Aviso", "Nenhum vídeo carregado ou câmera não acessada")
             return
         
-        # Se for um arquivo de vídeo, voltar ao início
-        if self.current_video_path != "camera":
-            self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        self.video_playing = True
+        capture = self.video_capture
         operation_names = {
             "grayscale": "Tons de Cinza",
             "negative": "Negativo", 
@@ -482,164 +650,395 @@ class ImageVideoProcessor:
             "closing": "Fechamento"
         }
         
-        self.video_status_var.set(f"Aplicando {operation_names[operation]} - Pressione 'Q' para sair")
+        steps = [operation] if isinstance(operation, str) else list(operation)
+        operation_label = " -> ".join(operation_names[name] for name in steps)
         
-        def video_operation_loop():
-            """Loop principal para operações de vídeo"""
-            while self.video_playing and self.video_capture.isOpened():
-                ret, frame = self.video_capture.read()
-                
-                if ret:
-                    # Aplicar a operação especificada
-                    processed_frame = self.apply_operation_to_frame(frame, operation)
-                    
-                    # Exibir o frame processado
-                    self.display_video_frame(processed_frame)
-                    
-                    # Adicionar informações no frame
-                    if self.current_video_path == "camera":
-                        cv2.putText(processed_frame, f"{operation_names[operation]} - Câmera - Pressione Q para sair", 
-                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    else:
-                        current_frame = int(self.video_capture.get(cv2.CAP_PROP_POS_FRAMES))
-                        total_frames = int(self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
-                        cv2.putText(processed_frame, f"{operation_names[operation]} - Frame: {current_frame}/{total_frames} - Pressione Q para sair", 
-                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    
-                    # Mostrar em uma janela separada do OpenCV
-                    cv2.imshow(f"Vídeo - {operation_names[operation]}", processed_frame)
-                    
-                    # Controlar a velocidade de reprodução
-                    if self.current_video_path == "camera":
-                        delay = 1  # Câmera em tempo real
-                    else:
-                        fps = self.video_capture.get(cv2.CAP_PROP_FPS)
-                        delay = max(1, int(1000 / fps)) if fps > 0 else 30
-                    
-                    # Verificar se o usuário pressionou 'q' para sair
-                    if cv2.waitKey(delay) & 0xFF == ord('q'):
-                        break
+        self.video_status_var.set(f"Aplicando {operation_label} - Pressione 'Q' para sair")
+        
+        is_camera = self.current_video_path == "camera"
+        total_frames = 0  # Lido da captura quando o loop começa
+        
+        def process_frame(frame):
+            """Estágio de processamento (executado em thread própria)"""
+            return self.apply_operation_to_frame(frame, operation)
+        
+        def render_frame(processed_frame, frame_index):
+            """Estágio de exibição"""
+            # Adicionar informações no frame
+            with profiler.stage("draw"):
+                if is_camera:
+                    cv2.putText(processed_frame, f"{operation_label} - Câmera - Pressione Q para sair", 
+                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 else:
-                    # Fim do vídeo (apenas para arquivos)
-                    if self.current_video_path != "camera":
-                        break
+                    cv2.putText(processed_frame, f"{operation_label} - Frame: {frame_index}/{total_frames} - Pressione Q para sair", 
+                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                if self.show_overlay:
+                    profiler.draw_overlay(processed_frame)
+            
+            # Exibir o frame processado na saída escolhida
+            with profiler.stage("display"):
+                output.show(processed_frame)
+            
+            # A cadência é feita pelo pipeline; aqui só verificamos o teclado
+            with profiler.stage("waitkey"):
+                return output.wait(1)
+        
+        profiler = self.profiler
+        output = self.create_video_output(f"Vídeo - {operation_label}")
+        
+        def video_operation_loop(worker):
+            """Loop principal para operações de vídeo"""
+            nonlocal total_frames
+            # Executado só depois que o loop anterior terminou de usar a captura
+            self.video_playing = True
+            profiler.reset()
+            
+            # Se for um arquivo de vídeo, voltar ao início
+            if not is_camera:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = None if is_camera else (capture.get(cv2.CAP_PROP_FPS) or 1000 / 30)
+            
+            # Câmera descarta frames antigos para manter a latência baixa;
+            # arquivos bloqueiam para não perder nenhum frame
+            pipeline = VideoPipeline(capture, process_frame, render_frame,
+                                     drop_policy=DROP_OLDEST if is_camera else BLOCK,
+                                     fps=fps, profiler=profiler)
+            pipeline.run(lambda: not worker.cancelled)
             
             # Limpar após o loop
-            cv2.destroyAllWindows()
+            output.close()
             self.video_playing = False
-            self.video_status_var.set(f"{operation_names[operation]} finalizado")
+            self.set_video_status(f"{operation_label} finalizado")
             
-            # Se era um arquivo de vídeo, resetar para o início
-            if self.current_video_path != "camera" and self.video_capture:
-                self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = self.video_capture.read()
+            # Se era um arquivo de vídeo, resetar para o início (a menos que
+            # o loop tenha sido cancelado para parar o vídeo ou iniciar outro)
+            if not is_camera and not worker.cancelled:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = capture.read()
                 if ret:
                     self.display_video_frame(frame)
         
-        # Executar o loop de operação de vídeo em uma thread separada
-        video_thread = threading.Thread(target=video_operation_loop)
-        video_thread.daemon = True
-        video_thread.start()
+        # Executar o loop de operação de vídeo em uma thread separada (substituindo o loop atual)
+        self.workers.start(video_operation_loop, "operacao")
     
     def apply_operation_to_frame(self, frame, operation):
-        """Aplica uma operação específica a um frame"""
+        """Aplica uma operação (ou cadeia de operações) a um frame"""
         try:
-            if operation == "grayscale":
-                # Converter para tons de cinza
-                if len(frame.shape) == 3:
-                    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                return frame
-                
-            elif operation == "negative":
-                # Converter para negativo
-                return 255 - frame
-                
-            elif operation == "binary":
-                # Converter para binária usando Otsu
-                if len(frame.shape) == 3:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                else:
-                    gray = frame
-                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                return binary
-                
-            elif operation == "mean":
-                # Aplicar filtro da média
-                return cv2.blur(frame, (5, 5))
-                
-            elif operation == "median":
-                # Aplicar filtro da mediana
-                return cv2.medianBlur(frame, 5)
-                
-            elif operation == "canny":
-                # Aplicar detector de bordas Canny
-                if len(frame.shape) == 3:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                else:
-                    gray = frame
-                return cv2.Canny(gray, 50, 150)
-                
-            elif operation == "erosion":
-                # Aplicar erosão
-                kernel = np.ones((5, 5), np.uint8)
-                return cv2.erode(frame, kernel, iterations=1)
-                
-            elif operation == "dilation":
-                # Aplicar dilatação
-                kernel = np.ones((5, 5), np.uint8)
-                return cv2.dilate(frame, kernel, iterations=1)
-                
-            elif operation == "opening":
-                # Aplicar abertura
-                kernel = np.ones((5, 5), np.uint8)
-                return cv2.morphologyEx(frame, cv2.MORPH_OPEN, kernel)
-                
-            elif operation == "closing":
-                # Aplicar fechamento
-                kernel = np.ones((5, 5), np.uint8)
-                return cv2.morphologyEx(frame, cv2.MORPH_CLOSE, kernel)
-                
-            else:
-                return frame
+            return self.get_frame_chain(operation).apply(frame)
                 
         except Exception as e:
             print(f"Erro ao aplicar operação {operation}: {str(e)}")
             return frame
+    
+    def get_frame_chain(self, operation):
+        """Retorna a cadeia compilada (mantida em cache) para a operação ou lista de operações"""
+        steps = (operation,) if isinstance(operation, str) else tuple(operation)
+        chain = self.frame_chains.get(steps)
+        
+        if chain is None:
+            # O resultado fica em buffers reutilizados; é preciso um buffer por
+            # frame que pode estar em trânsito no pipeline ao mesmo tempo
+            chain = ops.make_video_chain(steps, output_buffers=MAX_FRAMES_IN_FLIGHT, pool=self.frame_pool)
+            self.frame_chains[steps] = chain
+        
+        return chain
 
     def restore_original(self):
         """Método para restaurar imagem original - IMPLEMENTADO"""
         if self.original_image is not None and not self.is_video:
-            self.current_image = self.original_image.copy()
-            self.display_image(self.current_image)
+            # Passo do histórico que compartilha o original, sem copiá-lo
+            self.apply_image_step(ORIGINAL, "Restaurar Original")
             self.status_var.set("Imagem original restaurada")
         elif self.is_video:
             messagebox.showinfo("Info", "Para vídeos, use 'Parar Vídeo' e recarregue o vídeo")
         else:
             messagebox.showwarning("Aviso", "Nenhuma imagem carregada para restaurar")
     
+    # =========================================================================
+    # HISTÓRICO DA IMAGEM (DESFAZER/REFAZER)
+    # =========================================================================
+    
+    def apply_image_step(self, name, label, **params):
+        """Aplica uma operação de ops.OPERATIONS à imagem atual, registrando-a no histórico"""
+        self.current_image = self.history.apply(name, label, **params)
+        self.display_image(self.current_image)
+        self.update_history_buttons()
+    
+    def undo_image(self):
+        """Desfaz o último passo aplicado à imagem"""
+        if self.is_video or not self.history.can_undo:
+            return
+        label = self.history.undo_label
+        self.current_image = self.history.undo()
+        self.display_image(self.current_image)
+        self.update_history_buttons()
+        self.status_var.set(f"Desfeito: {label}")
+    
+    def redo_image(self):
+        """Refaz o último passo desfeito"""
+        if self.is_video or not self.history.can_redo:
+            return
+        label = self.history.redo_label
+        self.current_image = self.history.redo()
+        self.display_image(self.current_image)
+        self.update_history_buttons()
+        self.status_var.set(f"Refeito: {label}")
+    
+    def update_history_buttons(self):
+        """Habilita Desfazer/Refazer conforme o histórico"""
+        self.undo_button.configure(state=tk.NORMAL if self.history.can_undo else tk.DISABLED)
+        self.redo_button.configure(state=tk.NORMAL if self.history.can_redo else tk.DISABLED)
+    
+    def on_history_key(self, event, action):
+        """Ctrl+Z/Ctrl+Y fora dos campos de texto (que têm o próprio desfazer)"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return
+        action()
+    
+    # =========================================================================
+    # EDIÇÃO RÁPIDA (CÓPIA REDUZIDA) E RESOLUÇÃO TOTAL EM SEGUNDO PLANO
+    # =========================================================================
+    
+    def toggle_proxy_mode(self):
+        """Liga/desliga a edição sobre a cópia reduzida ao tamanho de exibição"""
+        if not self.proxy_var.get():
+            # Sair da edição rápida: os passos são reaplicados em resolução total
+            self.apply_full_resolution()
+            return
+        
+        if self.original_image is None or self.is_video:
+            self.proxy_var.set(False)
+            messagebox.showwarning("Aviso", "Nenhuma imagem carregada para editar")
+            return
+        
+        # Os passos já aplicados são refeitos sobre a cópia reduzida (rápido)
+        self.image_jobs.stop()
+        self.history = rebuild_history(proxy_image(self.original_image), self.history.recipe(),
+                                       self.history.memory_budget, self.results)
+        self.proxy_mode = True
+        self.show_history_image()
+        height, width = self.current_image.shape[:2]
+        self.status_var.set(f"Edição rápida em {width}x{height}: salve ou aplique em resolução total ao terminar")
+    
+    def apply_full_resolution(self):
+        """Reaplica os passos da edição rápida no original e sai da edição rápida"""
+        if not self.proxy_mode:
+            self.proxy_var.set(False)
+            if self.original_image is not None:
+                self.status_var.set("A imagem já está em resolução total")
+            return
+        
+        original = self.original_image
+        recipe = self.history.recipe()
+        
+        def finish(history):
+            self.ui.call(self.use_full_resolution, history, original, recipe)
+        
+        self.start_full_resolution(finish, "Aplicando em resolução total")
+    
+    def use_full_resolution(self, history, original, recipe):
+        """Troca o histórico da cópia reduzida pelo de resolução total (thread do Tk)"""
+        if original is not self.original_image or not self.proxy_mode or recipe != self.history.recipe():
+            self.proxy_var.set(self.proxy_mode)
+            self.status_var.set("A imagem mudou durante o processamento; aplique em resolução total novamente")
+            return
+        
+        self.history = history
+        self.proxy_mode = False
+        self.proxy_var.set(False)
+        self.show_history_image()
+        height, width = self.current_image.shape[:2]
+        self.status_var.set(f"Passos aplicados em resolução total ({width}x{height})")
+    
+    def start_full_resolution(self, finish, description):
+        """Reaplica os passos atuais no original em resolução total, em segundo plano
+
+        finish(history) é chamado na thread do processamento com o histórico em
+        resolução total, a menos que o processamento seja cancelado.
+        """
+        original = self.original_image
+        recipe = self.history.recipe()
+        budget = self.history.memory_budget
+        cache = self.results
+        
+        def progress(done, total):
+            self.ui.call(self.set_image_progress, done, total)
+        
+        def full_resolution_job(worker):
+            history = rebuild_history(original, recipe, budget, cache,
+                                      progress=progress, cancelled=lambda: worker.cancelled)
+            if history is None:
+                self.ui.call(self.proxy_var.set, self.proxy_mode)
+                self.set_image_status("Processamento em resolução total cancelado")
+                progress(0, 1)
+                return
+            finish(history)
+        
+        self.set_image_progress(0, 1)
+        self.status_var.set(f"{description}: processando {len(recipe)} passo(s) em resolução total...")
+        self.image_jobs.start(full_resolution_job, "resolucao_total")
+    
+    def cancel_image_job(self):
+        """Cancela o processamento da imagem em andamento (filtro ou resolução total)"""
+        if self.image_jobs.running:
+            self.image_jobs.stop()
+            self.status_var.set("Cancelando processamento...")
+    
+    def apply_image_step_in_background(self, name, label, done_message, **params):
+        """Aplica um filtro de vizinhança fora da thread do Tk
+
+        O filtro é uma única chamada do OpenCV (que já usa várias threads; as
+        faixas de tiled.apply_in_strips não mostraram ganho medido). O
+        resultado entra no histórico (e no cache) quando fica pronto, desde
+        que a imagem não tenha mudado e o processamento não tenha sido
+        cancelado nesse meio tempo.
+        """
+        if self.image_jobs.running:
+            self.status_var.set("Processamento em andamento: aguarde ou cancele")
+            return
+        
+        image = self.current_image
+        cache = self.results
+        
+        def progress(done, total):
+            self.ui.call(self.set_image_progress, done, total)
+        
+        def filter_job(worker):
+            # Mesma chave de ResultCache.apply: um resultado já calculado não é refeito
+            result = cache.apply(name, image, **params)
+            if worker.cancelled:
+                self.set_image_status(f"{label}: cancelado")
+                progress(0, 1)
+                return
+            self.ui.call(self.finish_image_step, name, label, params, image, result, done_message)
+        
+        self.set_image_progress(0, 1)
+        self.status_var.set(f"Aplicando {label}...")
+        self.image_jobs.start(filter_job, "filtro")
+    
+    def finish_image_step(self, name, label, params, image, result, done_message):
+        """Registra no histórico um passo calculado em segundo plano (thread do Tk)"""
+        if image is not self.current_image:
+            self.status_var.set(f"{label}: a imagem mudou durante o processamento; aplique novamente")
+            return
+        self.current_image = self.history.push(name, result, params, label)
+        self.display_image(self.current_image)
+        self.update_history_buttons()
+        self.set_image_progress(1, 1)
+        self.status_var.set(done_message)
+    
+    def set_image_progress(self, done, total):
+        """Atualiza a barra de progresso do processamento da imagem (thread do Tk)"""
+        self.image_progress["value"] = 100 * done / total if total else 100
+    
+    def set_image_status(self, text):
+        """Atualiza o status da aba de imagem (pode ser chamado de outras threads)"""
+        self.ui.call(self.status_var.set, text)
+    
+    def show_history_image(self):
+        """Exibe o passo atual do histórico"""
+        self.current_image = self.history.current
+        self.display_image(self.current_image)
+        self.update_history_buttons()
+    
+    def select_output_sink(self):
+        """Escolhe a saída dos próximos loops de vídeo (interface, janela OpenCV ou nenhuma)"""
+        # Lido pelas threads de vídeo; variáveis do Tk só na thread principal
+        self.output_sink = self.sink_var.get()
+    
+    def create_video_output(self, window_name):
+        """Saída de frames para um loop de vídeo, conforme a opção escolhida"""
+        return FrameOutput(self.output_sink, self.video_renderer, window_name)
+    
+    def on_key_press(self, event):
+        """Q ou Esc na janela principal param o loop de vídeo em execução"""
+        # Não interceptar a digitação em campos de texto (ex.: cadeia de operações)
+        if isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return
+        if event.keysym in ("q", "Q", "Escape") and self.workers.running:
+            self.workers.stop()
+            self.video_status_var.set("Parando vídeo...")
+    
+    def toggle_overlay(self):
+        """Liga/desliga o FPS e a latência desenhados sobre o vídeo"""
+        # Lido pelas threads de vídeo; variáveis do Tk só na thread principal
+        self.show_overlay = self.overlay_var.get()
+    
+    def export_metrics(self):
+        """Exporta os tempos por estágio do loop de vídeo atual (ou do último)"""
+        if not self.profiler.stages():
+            messagebox.showwarning("Aviso", "Nenhuma medição disponível. Execute uma operação de vídeo primeiro")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Exportar Métricas",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")]
+        )
+        if file_path:
+            try:
+                self.profiler.export(file_path)
+                self.video_status_var.set(f"Métricas exportadas para: {file_path}")
+            except OSError as e:
+                messagebox.showerror("Erro", f"Erro ao exportar métricas: {e}")
+    
+    def release_video_capture(self):
+        """Libera a captura atual assim que nenhum loop de vídeo estiver lendo dela"""
+        if self.video_capture is not None:
+            self.workers.release(self.video_capture)
+            self.video_capture = None
+    
+    def with_own_capture(self, loop, path):
+        """Envolve um loop que abre a própria captura: ao fim, a da interface é reaberta
+
+        A captura do loop é liberada na thread dele e a da interface
+        (self.video_capture) é reaberta na thread do Tk, de forma que
+        "Reproduzir Vídeo Normal" e as operações de vídeo continuem funcionando.
+        """
+        def run(worker):
+            try:
+                loop(worker)
+            finally:
+                worker.release_captures()
+                self.ui.call(self.reopen_video_capture, worker, path)
+        return run
+
+    def reopen_video_capture(self, worker, path):
+        """Reabre a captura de path se nenhum outro vídeo foi carregado ou iniciado depois de worker"""
+        if self.workers.current is not worker or self.video_capture is not None or path is None:
+            return
+        capture = cv2.VideoCapture(0 if path == "camera" else path)
+        if capture.isOpened():
+            self.video_capture = capture
+        else:
+            capture.release()
+
+    def set_video_status(self, text):
+        """Atualiza o status do vídeo (pode ser chamado pelas threads de vídeo)"""
+        self.ui.call(self.video_status_var.set, text)
+    
     def stop_video(self):
         """Método para parar vídeo - IMPLEMENTADO"""
+        # Cancelar o loop atual e esperar ele terminar (os loops só atualizam a
+        # interface por self.ui, então esperar aqui não trava a thread do Tk)
+        if not self.workers.join(timeout=STOP_TIMEOUT):
+            print("O loop de vídeo não terminou a tempo; a captura será liberada quando ele terminar")
         self.video_playing = False
         self.tracking_active = False
         self.detection_active = False
         
-        # Pequena pausa para garantir que as threads parem
-        time.sleep(0.1)
-        
-        if self.video_capture:
-            self.video_capture.release()
-            self.video_capture = None
+        self.release_video_capture()
         
         cv2.destroyAllWindows()
         self.video_status_var.set("Vídeo parado")
         
         # Limpar a exibição do vídeo
-        self.video_label.configure(
+        self.video_renderer.clear(
             text="Vídeo será exibido aqui\n\nUse 'Carregar Vídeo' ou 'Acessar Câmera' para começar",
             background='black', 
             foreground='white'
         )
-        self.video_label.image = None
 
     # =========================================================================
     # MÉTODOS AUXILIARES PARA EXIBIÇÃO
@@ -681,34 +1080,11 @@ class ImageVideoProcessor:
             messagebox.showerror("Erro", f"Erro ao exibir imagem: {str(e)}")
     
     def display_video_frame(self, frame):
-        """Exibe um frame de vídeo na interface"""
-        if frame is None:
-            return
-            
+        """Exibe um frame de vídeo na interface (pode ser chamado de qualquer thread)"""
         try:
-            # Redimensionar frame para caber no display
-            h, w = frame.shape[:2]
-            max_width = 800
-            max_height = 600
-            
-            if w > max_width or h > max_height:
-                scale = min(max_width/w, max_height/h)
-                new_w, new_h = int(w*scale), int(h*scale)
-                frame = cv2.resize(frame, (new_w, new_h))
-            
-            # Converter para RGB se necessário
-            if len(frame.shape) == 2:  # Imagem em tons de cinza
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
-            else:  # Imagem colorida
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Converter para ImageTk
-            pil_image = Image.fromarray(frame_rgb)
-            tk_image = ImageTk.PhotoImage(pil_image)
-            
-            # Atualizar a label
-            self.video_label.configure(image=tk_image, text="")
-            self.video_label.image = tk_image
+            # Conversão feita aqui; o desenho é agendado na thread do Tk e
+            # frames que chegarem antes dele substituem o pendente
+            self.video_renderer.submit(frame)
             
         except Exception as e:
             print(f"Erro ao exibir frame: {str(e)}")
@@ -729,7 +1105,16 @@ class ImageVideoProcessor:
                     ("Todos os arquivos", "*.*")
                 ]
             )
-            if file_path:
+            if file_path and self.proxy_mode:
+                # Na edição rápida salva-se a resolução total, calculada em segundo plano
+                def save(history):
+                    if cv2.imwrite(file_path, history.current):
+                        self.set_image_status(f"Imagem salva em resolução total em: {file_path}")
+                    else:
+                        self.set_image_status(f"Erro ao salvar a imagem em: {file_path}")
+                
+                self.start_full_resolution(save, "Salvando")
+            elif file_path:
                 cv2.imwrite(file_path, self.current_image)
                 self.status_var.set(f"Imagem salva em: {file_path}")
                 messagebox.showinfo("Sucesso", "Imagem salva com sucesso!")
@@ -739,9 +1124,9 @@ class ImageVideoProcessor:
     def apply_mean_filter(self):
         if self.current_image is not None and not self.is_video:
             kernel_size = 5  # Pode tornar configurável
-            self.current_image = cv2.blur(self.current_image, (kernel_size, kernel_size))
-            self.display_image(self.current_image)
-            self.status_var.set(f"Filtro da média aplicado (kernel {kernel_size}x{kernel_size})")
+            self.apply_image_step_in_background("mean", "Filtro da Média",
+                                                f"Filtro da média aplicado (kernel {kernel_size}x{kernel_size})",
+                                                kernel_size=kernel_size)
         else:
             messagebox.showwarning("Aviso", "Nenhuma imagem carregada para processar")
 
@@ -749,55 +1134,35 @@ class ImageVideoProcessor:
     def apply_median_filter(self):
         if self.current_image is not None and not self.is_video:
             kernel_size = 5  # Pode tornar configurável
-            self.current_image = cv2.medianBlur(self.current_image, kernel_size)
-            self.display_image(self.current_image)
-            self.status_var.set(f"Filtro da mediana aplicado (kernel {kernel_size})")
+            self.apply_image_step_in_background("median", "Filtro da Mediana",
+                                                f"Filtro da mediana aplicado (kernel {kernel_size})",
+                                                kernel_size=kernel_size)
         else:
             messagebox.showwarning("Aviso", "Nenhuma imagem carregada para processar")
         
     def apply_canny(self):
         if self.current_image is not None and not self.is_video:
-            # Converter para tons de cinza se necessário
-            if len(self.current_image.shape) == 3:
-                gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = self.current_image
-            
-            # Aplicar Canny
-            edges = cv2.Canny(gray, 100, 200)  # Thresholds podem ser configuráveis
-            self.current_image = edges
-            self.display_image(self.current_image)
+            # Aplicar Canny (converte para tons de cinza se necessário)
+            self.apply_image_step("canny", "Canny", low_threshold=100, high_threshold=200)  # Thresholds podem ser configuráveis
             self.status_var.set("Detector de bordas Canny aplicado")
         else:
             messagebox.showwarning("Aviso", "Nenhuma imagem carregada para processar")
         
     def apply_erosion(self):
         if self.current_image is not None and not self.is_video:
-            kernel = np.ones((5,5), np.uint8)
-            self.current_image = cv2.erode(self.current_image, kernel, iterations=1)
-            self.display_image(self.current_image)
-            self.status_var.set("Erosão aplicada")
+            self.apply_image_step_in_background("erosion", "Erosão", "Erosão aplicada", kernel_size=5)
 
     def apply_dilation(self):
         if self.current_image is not None and not self.is_video:
-            kernel = np.ones((5,5), np.uint8)
-            self.current_image = cv2.dilate(self.current_image, kernel, iterations=1)
-            self.display_image(self.current_image)
-            self.status_var.set("Dilatação aplicada")
+            self.apply_image_step_in_background("dilation", "Dilatação", "Dilatação aplicada", kernel_size=5)
 
     def apply_opening(self):
         if self.current_image is not None and not self.is_video:
-            kernel = np.ones((5,5), np.uint8)
-            self.current_image = cv2.morphologyEx(self.current_image, cv2.MORPH_OPEN, kernel)
-            self.display_image(self.current_image)
-            self.status_var.set("Abertura aplicada")
+            self.apply_image_step_in_background("opening", "Abertura", "Abertura aplicada", kernel_size=5)
 
     def apply_closing(self):
         if self.current_image is not None and not self.is_video:
-            kernel = np.ones((5,5), np.uint8)
-            self.current_image = cv2.morphologyEx(self.current_image, cv2.MORPH_CLOSE, kernel)
-            self.display_image(self.current_image)
-            self.status_var.set("Fechamento aplicada")
+            self.apply_image_step_in_background("closing", "Fechamento", "Fechamento aplicada", kernel_size=5)
 
     def show_histogram(self):
         if self.current_image is not None and not self.is_video:
@@ -830,35 +1195,17 @@ class ImageVideoProcessor:
         
     def calculate_metrics(self):
         if self.current_image is not None and not self.is_video:
-            # Verificar se a imagem é binária, se não, converter
-            if len(self.current_image.shape) == 3 or np.max(self.current_image) > 1:
-                # Converter para binária usando Otsu
-                if len(self.current_image.shape) == 3:
-                    gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-                else:
-                    gray = self.current_image
-                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            else:
-                binary = self.current_image
-            
-            # Encontrar contornos
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Binarizar (se necessário) e medir o maior contorno, reaproveitando
+            # a binária e as métricas já calculadas para esta imagem
+            metrics = self.results.calculate_metrics(self.current_image)
             
-            if contours:
-                # Calcular métricas para o maior contorno (ou todos)
-                largest_contour = max(contours, key=cv2.contourArea)
-                
-                # Área
-                area = cv2.contourArea(largest_contour)
-                
-                # Perímetro
-                perimeter = cv2.arcLength(largest_contour, True)
-                
-                # Diâmetro (diâmetro do círculo com mesma área)
-                diameter = 2 * np.sqrt(area / np.pi)
-                
+            if metrics is not None:
                 # Exibir resultados
-                result_text = f"Métricas do Objeto:\n\nÁrea: {area:.2f} pixels\nPerímetro: {perimeter:.2f} pixels\nDiâmetro: {diameter:.2f} pixels"
+                result_text = (f"Métricas do Objeto:\n\nÁrea: {metrics['area']:.2f} pixels\n"
+                               f"Perímetro: {metrics['perimeter']:.2f} pixels\n"
+                               f"Diâmetro: {metrics['diameter']:.2f} pixels")
+                if self.proxy_mode:
+                    result_text += f"\n\n{PROXY_ANALYSIS_NOTE}"
                 messagebox.showinfo("Métricas da Imagem Binária", result_text)
                 self.status_var.set("Métricas calculadas")
             else:
@@ -868,52 +1215,16 @@ class ImageVideoProcessor:
         
     def count_objects(self):
         if self.current_image is not None and not self.is_video:
-            # Garantir que a imagem é binária
-            if len(self.current_image.shape) == 3 or np.max(self.current_image) > 1:
-                if len(self.current_image.shape) == 3:
-                    gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-                else:
-                    gray = self.current_image
-                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            else:
-                binary = self.current_image
+            # Rotulagem de componentes conexos (8-conectividade) da imagem
+            # binarizada, reaproveitando a binária já calculada para esta imagem
+            count, stats, _ = self.results.component_stats(self.current_image, connectivity=8)
             
-            # Algoritmo de crescimento de região (flood fill)
-            def region_growing_count(img):
-                height, width = img.shape
-                visited = np.zeros_like(img, dtype=bool)
-                object_count = 0
-                
-                # Direções dos vizinhos (8-conectividade)
-                directions = [(-1, -1), (-1, 0), (-1, 1),
-                            (0, -1),           (0, 1),
-                            (1, -1),  (1, 0),  (1, 1)]
-                
-                def grow_region(x, y, label):
-                    stack = [(x, y)]
-                    visited[y, x] = True
-                    
-                    while stack:
-                        cx, cy = stack.pop()
-                        for dx, dy in directions:
-                            nx, ny = cx + dx, cy + dy
-                            if (0 <= nx < width and 0 <= ny < height and 
-                                not visited[ny, nx] and img[ny, nx] == 255):
-                                visited[ny, nx] = True
-                                stack.append((nx, ny))
-                
-                # Percorrer a imagem
-                for y in range(height):
-                    for x in range(width):
-                        if img[y, x] == 255 and not visited[y, x]:
-                            object_count += 1
-                            grow_region(x, y, object_count)
-                
-                return object_count
-            
-            # Contar objetos
-            count = region_growing_count(binary)
-            messagebox.showinfo("Contagem de Objetos", f"Número de objetos encontrados: {count}")
+            result_text = f"Número de objetos encontrados: {count}"
+            if count > 0:
+                result_text += f"\nMaior objeto: {stats[:, cv2.CC_STAT_AREA].max()} pixels"
+            if self.proxy_mode:
+                result_text += f"\n\n{PROXY_ANALYSIS_NOTE}"
+            messagebox.showinfo("Contagem de Objetos", result_text)
             self.status_var.set(f"Objetos contados: {count}")
             
         else:
@@ -922,99 +1233,109 @@ class ImageVideoProcessor:
     def object_tracking(self):
         print("Iniciando detecção avançada de rostos e olhos...")
         
-        self.stop_video()
-        time.sleep(0.5)
-
-        try:
-            self.video_capture = cv2.VideoCapture(0)
-            if not self.video_capture.isOpened():
-                messagebox.showerror("Erro", "Não foi possível acessar a câmera")
-                return
-                
-            self.video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao acessar câmera: {e}")
-            return
+        # O loop atual é cancelado ao iniciar este; a captura dele é liberada
+        # assim que ele terminar
+        self.release_video_capture()
 
-        # Carregar classificadores
+        # Carregar classificadores (uma vez; o motor é reaproveitado entre execuções).
+        # Detecção completa a cada 10 frames; nos demais, rastreamento local
         try:
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-            
-            if face_cascade.empty() or eye_cascade.empty():
-                messagebox.showerror("Erro", "Classificadores não encontrados")
-                return
-                
+            if self.face_engine is None:
+                self.face_engine = FaceEyeDetector(detect_interval=10).init()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar classificadores: {e}")
             return
+        face_engine = self.face_engine
+        face_engine.reset()
+        print(f"Escala de detecção: {face_engine.detection_scale} "
+              f"(equalização: {'sim' if face_engine.equalize else 'não'})")
 
-        self.video_playing = True
-        self.detection_active = True
         self.current_video_path = "camera"
 
-        def advanced_detection_loop():
+        profiler = self.profiler
+        output = self.create_video_output("Detecção de Rostos e Olhos")
+        
+        def advanced_detection_loop(worker):
+            # A câmera é aberta só depois que o loop anterior a liberou, e é
+            # liberada pelo worker ao fim deste loop
+            try:
+                capture = worker.own(cv2.VideoCapture(0))
+                if not capture.isOpened():
+                    self.ui.call(messagebox.showerror, "Erro", "Não foi possível acessar a câmera")
+                    return
+                capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            except Exception as e:
+                self.ui.call(messagebox.showerror, "Erro", f"Erro ao acessar câmera: {e}")
+                return
+            
+            self.video_playing = True
+            self.detection_active = True
+            profiler.reset()
             frame_count = 0
+            pool = self.frame_pool
+            captured = None
             
-            while self.video_playing and self.detection_active and self.video_capture.isOpened():
-                ret, frame = self.video_capture.read()
+            while not worker.cancelled and capture.isOpened():
+                # Ler, espelhar e converter usando buffers reutilizados
+                started = time.perf_counter()
+                with profiler.stage("capture"):
+                    ret, captured = capture.read(captured)
                 frame_count += 1
                 
                 if not ret:
                     break
 
-                frame = cv2.flip(frame, 1)
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                with profiler.stage("process"):
+                    frame = cv2.flip(captured, 1, dst=pool.get("face_flip", captured.shape))
                 
-                # Detectar rostos
-                faces = face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+                # Detectar (ou rastrear) rostos e olhos
+                with profiler.stage("detect"):
+                    faces = face_engine.process(frame)
                 
-                processed_frame = frame.copy()
-                face_count = len(faces)
+                # Desenhar direto no frame espelhado (a detecção usa uma cópia em tons de cinza)
+                with profiler.stage("draw"):
+                    processed_frame = frame
+                    face_count = len(faces)
                 
-                for (x, y, w, h) in faces:
-                    # Desenhar rosto
-                    cv2.rectangle(processed_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    
-                    # Região de interesse para olhos (parte superior do rosto)
-                    roi_gray = gray[y:y + int(h/2), x:x + w]
-                    roi_color = processed_frame[y:y + int(h/2), x:x + w]
+                    for (x, y, w, h), eyes in faces:
+                        # Desenhar rosto
+                        cv2.rectangle(processed_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
                     
-                    # Detectar olhos dentro do rosto
-                    eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 3)
+                        # Região dos olhos (parte superior do rosto)
+                        roi_color = processed_frame[y:y + int(h/2), x:x + w]
                     
-                    for (ex, ey, ew, eh) in eyes:
-                        # Desenhar olhos
-                        cv2.rectangle(roi_color, (ex, ey), (ex + ew, ey + eh), (255, 0, 0), 2)
-                        cv2.putText(roi_color, "Olho", (ex, ey-5), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
+                        for (ex, ey, ew, eh) in eyes:
+                            # Desenhar olhos
+                            cv2.rectangle(roi_color, (ex, ey), (ex + ew, ey + eh), (255, 0, 0), 2)
+                            cv2.putText(roi_color, "Olho", (ex, ey-5), 
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
                 
-                # Informações na tela
-                cv2.putText(processed_frame, f"Rostos: {face_count}", (10, 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                cv2.putText(processed_frame, "Pressione 'Q' para sair", 
-                        (10, processed_frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    # Informações na tela
+                    cv2.putText(processed_frame, f"Rostos: {face_count}", (10, 30), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                    cv2.putText(processed_frame, "Pressione 'Q' para sair", 
+                            (10, processed_frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    if self.show_overlay:
+                        profiler.draw_overlay(processed_frame)
                 
-                self.display_video_frame(processed_frame)
-                cv2.imshow("Detecção de Rostos e Olhos", processed_frame)
+                with profiler.stage("display"):
+                    output.show(processed_frame)
                 
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                with profiler.stage("waitkey"):
+                    keep_going = output.wait(1)
+                profiler.frame_done(time.perf_counter() - started)
+                if not keep_going:
                     break
             
-            cv2.destroyAllWindows()
+            output.close()
             self.video_playing = False
             self.detection_active = False
-            if self.video_capture:
-                self.video_capture.release()
             
             print(f"Detecção avançada finalizada. Frames: {frame_count}")
-            self.video_status_var.set("Detecção avançada finalizada")
+            self.set_video_status("Detecção avançada finalizada")
         
-        advanced_thread = threading.Thread(target=advanced_detection_loop)
-        advanced_thread.daemon = True
-        advanced_thread.start()
+        self.workers.start(self.with_own_capture(advanced_detection_loop, "camera"), "deteccao_rostos")
             
     def detect_microphone(self):
         print("Iniciando detecção de microfone...")
@@ -1023,149 +1344,101 @@ class ImageVideoProcessor:
             messagebox.showwarning("Aviso", "Nenhum vídeo carregado")
             return
 
-        # Parar qualquer vídeo anterior
-        self.stop_video()
-        time.sleep(0.5)  # Dar tempo para liberar recursos
+        # Parar qualquer vídeo anterior: o loop atual é cancelado ao iniciar
+        # este e a captura dele é liberada assim que ele terminar
+        self.release_video_capture()
+        video_path = self.current_video_path
 
-        # Recriar o video_capture com configurações diferentes
-        try:
-            if self.current_video_path == "camera":
-                self.video_capture = cv2.VideoCapture(0)
-                # Configurações para câmera
-                self.video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            else:
-                # Para arquivos de vídeo, tentar diferentes backends
-                self.video_capture = cv2.VideoCapture(self.current_video_path)
-                
-            if not self.video_capture.isOpened():
-                messagebox.showerror("Erro", "Não foi possível abrir o vídeo/câmera")
+        # Carregar descritores dos templates (do cache em disco quando possível) e
+        # inicializar o ORB, que é mais rápido e robusto; o motor é reaproveitado
+        # entre execuções
+        if self.microphone_engine is None:
+            print("Carregando templates...")
+            try:
+                self.microphone_engine = MicrophoneDetector().init()
+            except ValueError as e:
+                messagebox.showerror("Erro", str(e))
                 return
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao abrir vídeo: {e}")
-            return
-
-        # Carregar templates
-        print("Carregando templates...")
-        microphone_templates = self.load_microphone_templates()
-        print(f"Templates carregados: {len(microphone_templates)}")
-        
-        if not microphone_templates:
-            messagebox.showwarning("Aviso", "Não foram encontrados templates do microfone")
-            return
-
-        # Inicializar detector - usar ORB que é mais rápido e robusto
-        print("Inicializando detector ORB...")
-        detector = cv2.ORB_create(nfeatures=500)
-        
-        # Extrair características dos templates
-        template_descriptors = []
-        
-        for i, template in enumerate(microphone_templates):
-            # Redimensionar templates para tamanho consistente
-            template = cv2.resize(template, (100, 100))
-            kp, des = detector.detectAndCompute(template, None)
-            if des is not None:
-                template_descriptors.append(des)
-                print(f"Template {i+1}: {len(kp)} keypoints")
-            else:
-                print(f"Template {i+1}: Não foi possível extrair características")
-        
-        if not template_descriptors:
-            messagebox.showerror("Erro", "Não foi possível extrair características dos templates")
-            return
-
-        # Configurar matcher
-        matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-
-        self.video_playing = True
-        self.detection_active = True
-        self.sound_playing = False
-        self.microphone_detected = False
+            except Exception as e:
+                print(f"Erro ao carregar templates: {e}")
+                messagebox.showwarning("Aviso", "Não foram encontrados templates do microfone")
+                return
+            
+            for name, des in self.microphone_engine.templates:
+                if len(des) > 0:
+                    print(f"Template {name}: {len(des)} keypoints")
+                else:
+                    print(f"Template {name}: Não foi possível extrair características")
+        microphone_engine = self.microphone_engine
+        profiler = self.profiler
+        output = self.create_video_output("Detecção de Microfone Vermelho")
+        print(f"Templates carregados: {len(microphone_engine.templates)}")
 
-        def detection_loop():
+        def detection_loop(worker):
+            # Abrir uma captura própria com configurações diferentes, só depois
+            # que o loop anterior liberou a câmera/arquivo; o worker a libera
+            # ao fim deste loop
+            try:
+                if video_path == "camera":
+                    capture = worker.own(cv2.VideoCapture(0))
+                    # Configurações para câmera
+                    capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                else:
+                    capture = worker.own(cv2.VideoCapture(video_path))
+                    
+                if not capture.isOpened():
+                    self.ui.call(messagebox.showerror, "Erro", "Não foi possível abrir o vídeo/câmera")
+                    return
+            except Exception as e:
+                self.ui.call(messagebox.showerror, "Erro", f"Erro ao abrir vídeo: {e}")
+                return
+            
+            self.video_playing = True
+            self.detection_active = True
+            self.sound_playing = False
+            self.microphone_detected = False
             frame_count = 0
             detection_count = 0
+            pool = self.frame_pool
+            captured = None
             
-            while self.video_playing and self.detection_active:
+            # Intervalo entre frames: FPS do vídeo/câmera (30 se desconhecido)
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            microphone_engine.reset(1.0 / fps if fps and fps > 0 else 1.0 / 30)
+            profiler.reset()
+            microphone_engine.profiler = profiler
+            
+            while not worker.cancelled:
                 try:
-                    ret, frame = self.video_capture.read()
+                    # O frame lido é reaproveitado como destino da próxima leitura
+                    started = time.perf_counter()
+                    with profiler.stage("capture"):
+                        ret, captured = capture.read(captured)
                     frame_count += 1
                     
                     if not ret:
                         print("Fim do vídeo ou erro na leitura do frame")
                         break
                         
-                    # Pular frames para melhor performance (processar 1 a cada 3 frames)
-                    if frame_count % 3 != 0:
+                    # Pular frames conforme o tempo de processamento medido
+                    if not microphone_engine.should_process():
                         continue
 
-                    # Reduzir resolução para melhor performance
-                    frame = cv2.resize(frame, (640, 480))
-                    processed_frame = frame.copy()
-                    
-                    # 1. PRÉ-FILTRAGEM POR COR VERMELHA
-                    red_mask = self.detect_red_color(frame)
-                    red_regions = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                    red_regions = red_regions[0] if len(red_regions) == 2 else red_regions[1]
-                    
-                    # 2. DETECÇÃO DE CARACTERÍSTICAS
-                    microphone_found = False
-                    best_match_score = 0
-                    best_match_location = None
+                    # Reduzir resolução para melhor performance (em buffer reutilizado)
+                    with profiler.stage("process"):
+                        frame = cv2.resize(captured, (640, 480), dst=pool.get("mic_frame", (480, 640, 3)))
                     
-                    for contour in red_regions:
-                        if cv2.contourArea(contour) < 300:  # Aumentei a área mínima
-                            continue
-                        
-                        x, y, w, h = cv2.boundingRect(contour)
-                        
-                        # Verificar proporção para filtrar formas não retangulares
-                        aspect_ratio = w / h
-                        if aspect_ratio < 0.3 or aspect_ratio > 3.0:
-                            continue
-                        
-                        # Expandir ROI
-                        padding = 15
-                        x = max(0, x - padding)
-                        y = max(0, y - padding)
-                        w = min(frame.shape[1] - x, w + 2 * padding)
-                        h = min(frame.shape[0] - y, h + 2 * padding)
-                        
-                        roi = frame[y:y+h, x:x+w]
-                        
-                        if roi.size == 0:
-                            continue
-                        
-                        # Redimensionar ROI para tamanho consistente
-                        roi = cv2.resize(roi, (100, 100))
-                        roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-                        
-                        # Detectar características
-                        kp_frame, des_frame = detector.detectAndCompute(roi_gray, None)
-                        
-                        if des_frame is not None and len(des_frame) > 10:
-                            for template_des in template_descriptors:
-                                try:
-                                    matches = matcher.match(template_des, des_frame)
-                                    matches = sorted(matches, key=lambda x: x.distance)
-                                    
-                                    # Pegar melhores matches (30% dos melhores)
-                                    good_matches = matches[:int(len(matches) * 0.3)]
-                                    match_score = len(good_matches)
-                                    
-                                    if match_score > best_match_score:
-                                        best_match_score = match_score
-                                        best_match_location = (x, y, w, h)
-                                        microphone_found = True
-                                        
-                                except Exception as e:
-                                    continue
+                    # Desenhar direto no frame: as ROIs são extraídas antes do desenho
+                    processed_frame = frame
                     
-                    # 3. VERIFICAR DETECÇÃO
-                    detection_threshold = 15  # Aumentei o threshold
+                    # Pré-filtragem por cor vermelha + características ORB das regiões candidatas
+                    # (registradas pelo motor como estágios "detect" e "match")
+                    detections = microphone_engine.process(frame)
+                    best_match_score = microphone_engine.last_score
                     
-                    if microphone_found and best_match_score > detection_threshold:
+                    # VERIFICAR DETECÇÃO
+                    if detections:
                         detection_count += 1
                         if not self.sound_playing:
                             try:
@@ -1175,35 +1448,36 @@ class ImageVideoProcessor:
                                 print(f"🎤 Microfone detectado! Score: {best_match_score}")
                             except Exception as e:
                                 print(f"Erro ao tocar som: {e}")
-                        
-                        # Desenhar detecção
-                        x, y, w, h = best_match_location
-                        cv2.rectangle(processed_frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
-                        cv2.putText(processed_frame, f"MICROFONE (Score: {best_match_score})", 
-                                (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                     else:
                         if self.sound_playing:
                             self.stop_detection_sound()
                             self.sound_playing = False
                             self.microphone_detected = False
                     
-                    # Exibir informações
-                    status_text = f"Frame: {frame_count} | Microfone: {'DETECTADO' if self.microphone_detected else 'Nao detectado'} | Score: {best_match_score}"
-                    cv2.putText(processed_frame, status_text, (10, 30), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    
-
-                    
-                    # Exibir na interface
-                    self.display_video_frame(processed_frame)
+                    with profiler.stage("draw"):
+                        # Desenhar detecção
+                        for (x, y, w, h), score in detections:
+                            cv2.rectangle(processed_frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
+                            cv2.putText(processed_frame, f"MICROFONE (Score: {score})", 
+                                    (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        
+                        # Exibir informações
+                        status_text = f"Frame: {frame_count} | Microfone: {'DETECTADO' if self.microphone_detected else 'Nao detectado'} | Score: {best_match_score}"
+                        cv2.putText(processed_frame, status_text, (10, 30), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        if self.show_overlay:
+                            profiler.draw_overlay(processed_frame)
                     
-                    # Mostrar em janela separada
-                    cv2.imshow("Detecção de Microfone Vermelho", processed_frame)
+                    # Exibir na saída escolhida (interface ou janela separada)
+                    with profiler.stage("display"):
+                        output.show(processed_frame)
                     
                     # Controle de velocidade
-                    delay = 1 if self.current_video_path == "camera" else 30
-                    key = cv2.waitKey(delay) & 0xFF
-                    if key == ord('q'):
+                    delay = 1 if video_path == "camera" else 30
+                    with profiler.stage("waitkey"):
+                        keep_going = output.wait(delay)
+                    profiler.frame_done(time.perf_counter() - started)
+                    if not keep_going:
                         print("Detecção interrompida pelo usuário")
                         break
                         
@@ -1212,91 +1486,17 @@ class ImageVideoProcessor:
                     continue
             
             # Limpeza final
-            cv2.destroyAllWindows()
+            output.close()
             self.video_playing = False
             self.detection_active = False
             if self.sound_playing:
                 self.stop_detection_sound()
             
             print(f"Detecção finalizada. Frames: {frame_count}, Detecções: {detection_count}")
-            self.video_status_var.set("Detecção de microfone finalizada")
-        
-        # Executar em thread
-        detection_thread = threading.Thread(target=detection_loop)
-        detection_thread.daemon = True
-        detection_thread.start()
-
-    def detect_red_color(self, frame):
-        """Detectar regiões vermelhas na imagem"""
-        # Converter para HSV para melhor detecção de cor
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Definir ranges para vermelho (HSV)
-        # Vermelho tem dois ranges porque fica nos extremos do espectro
-        lower_red1 = np.array([0, 120, 70])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 120, 70])
-        upper_red2 = np.array([180, 255, 255])
-        
-        # Criar máscaras
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        red_mask = cv2.bitwise_or(mask1, mask2)
-        
-        # Operações morfológicas para limpar a máscara
-        kernel = np.ones((5,5), np.uint8)
-        red_mask = cv2.morphologyEx(red_mask, cv2.MORPH_OPEN, kernel)
-        red_mask = cv2.morphologyEx(red_mask, cv2.MORPH_CLOSE, kernel)
-        
-        return red_mask
-
-    def load_microphone_templates(self):
-        """Carregar templates do microfone vermelho"""
-        templates = []
-        
-        # Aqui você deve carregar suas imagens do microfone
-        # Por enquanto, vou criar templates sintéticos - substitua por suas imagens reais
-        try:
-            # Exemplo: carregar de um diretório
-            template_files = [
-                "microphone_template1.jpg",
-                "microphone_template2.jpg", 
-                "microphone_template3.jpg",
-                "microphone_template4.jpg",
-                "microphone_template5.jpg",
-                "microphone_template6.jpg",
-                "microphone_template7.jpg",
-                "microphone_template8.jpg",
-                "microphone_template9.jpg",
-                "microphone_template10.jpg",
-                "microphone_template11.jpg",
-                "microphone_template12.jpg",
-                "microphone_template13.jpg",
-                "microphone_template14.jpg",
-                "microphone_template15.jpg",
-                "microphone_template16.jpg"
-            ]
-            
-            for file in template_files:
-                if os.path.exists(file):
-                    template = cv2.imread(file)
-                    if template is not None:
-                        # Converter para tons de cinza
-                        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-                        templates.append(template_gray)
-            
-            # Se não encontrou arquivos, criar um template simples (remova isso quando tiver suas imagens)
-            if not templates:
-                # Template sintético - SUBSTITUA POR IMAGENS REAIS DO SEU MICROFONE
-                synthetic_template = np.zeros((50, 30), dtype=np.uint8)
-                cv2.rectangle(synthetic_template, (10, 5), (20, 45), 255, -1)  # Cabo
-                cv2.circle(synthetic_template, (15, 15), 10, 255, -1)  # Cabeça
-                templates.append(synthetic_template)
-                
-        except Exception as e:
-            print(f"Erro ao carregar templates: {e}")
+            self.set_video_status("Detecção de microfone finalizada")
         
-        return templates
+        # Executar em thread (substituindo o loop atual)
+        self.workers.start(self.with_own_capture(detection_loop, video_path), "deteccao_microfone")
 
     def play_detection_sound(self):
         """Tocar música quando microfone for detectado"""
@@ -1329,6 +1529,10 @@ if __name__ == "__main__":
     
     def on_closing():
         """Função chamada ao fechar a janela"""
+        # Parar o loop de vídeo antes de destruir os widgets que ele atualiza
+        app.workers.join(timeout=1.0)
+        app.image_jobs.join(timeout=1.0)
+        app.ui.close()
         root.quit()
         root.destroy()
     
@@ -0,0 +1,536 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+import image_operations as ops
+
+# =========================================================================
+# PIPELINE DE VÍDEO EM THREADS (CAPTURA -> PROCESSAMENTO -> EXIBIÇÃO)
+# =========================================================================
+
+# Políticas para quando a fila seguinte está cheia
+DROP_OLDEST = "drop_oldest"  # Descarta o frame mais antigo (câmera ao vivo)
+BLOCK = "block"              # Espera haver espaço (arquivos, nenhum frame perdido)
+
+# Tamanho padrão das filas entre estágios
+DEFAULT_QUEUE_SIZE = 4
+
+# Máximo de frames processados em trânsito ao mesmo tempo: fila de exibição
+# cheia, um sendo exibido e um sendo processado. A fila de exibição sempre
+# bloqueia (o descarte acontece na fila de captura), então um processamento
+# que escreve em MAX_FRAMES_IN_FLIGHT buffers em rodízio nunca sobrescreve um
+# frame ainda não exibido
+MAX_FRAMES_IN_FLIGHT = DEFAULT_QUEUE_SIZE + 2
+
+# Marcador de fim de fluxo
+_END = object()
+
+
+class VideoPipeline:
+    """Pipeline produtor/consumidor para processamento de vídeo
+
+    A captura e o processamento rodam em threads próprias, ligadas por filas
+    limitadas; a exibição roda na thread que chama run(). Assim a vazão fica
+    próxima à do estágio mais lento, e não à soma dos estágios.
+
+    process_frame(frame) retorna o frame processado. render_frame(frame, index)
+    exibe o resultado e retorna False para encerrar o pipeline.
+
+    Com DROP_OLDEST os frames antigos são descartados na fila de captura; a
+    fila de exibição guarda um único frame e bloqueia, para que o resultado
+    de process_frame (ex.: buffers em rodízio de uma OperationChain) não seja
+    sobrescrito enquanto é exibido. Os frames lidos ficam em buffers que só
+    voltam a ser usados depois de descartados, processados ou (se
+    process_frame devolver o próprio frame) exibidos.
+
+    Com um profiler (instrumentation.StageProfiler) são registrados os
+    estágios "capture" e "process" e a latência de cada frame, da leitura
+    ao fim de render_frame.
+    """
+
+    def __init__(self, capture, process_frame, render_frame, drop_policy=BLOCK,
+                 queue_size=DEFAULT_QUEUE_SIZE, fps=None, profiler=None):
+        if drop_policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Política de descarte inválida: {drop_policy}")
+
+        self.capture = capture
+        self.process_frame = process_frame
+        self.render_frame = render_frame
+        self.drop_policy = drop_policy
+        self.fps = fps  # Se definido, a exibição é cadenciada nesse FPS
+        self.profiler = profiler
+
+        self.capture_queue = queue.Queue(maxsize=queue_size)
+        # Ao vivo, a exibição mostra sempre o frame processado mais recente possível
+        self.render_queue = queue.Queue(maxsize=1 if drop_policy == DROP_OLDEST else queue_size)
+        self.stop_event = threading.Event()
+        self.dropped_frames = 0
+
+        # Buffers de captura livres: o frame lido volta para cá quando ninguém
+        # mais o usa, então um buffer nunca é regravado durante o uso. Cabem
+        # todos os frames que podem estar nas duas filas e nos três estágios
+        self._free_buffers = queue.SimpleQueue()
+        self.capture_buffers = self.capture_queue.maxsize + self.render_queue.maxsize + 3
+
+    def _release(self, buffer):
+        """Devolve um buffer de captura para reuso"""
+        self._free_buffers.put(buffer)
+
+    def _take_buffer(self):
+        """Buffer de captura livre, ou None para a leitura alocar um novo"""
+        try:
+            return self._free_buffers.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _put(self, target_queue, item):
+        """Coloca um item na fila respeitando a política de descarte
+
+        Só a fila de captura descarta frames; o buffer descartado é liberado.
+        """
+        drop = (self.drop_policy == DROP_OLDEST and target_queue is self.capture_queue
+                and item is not _END)
+        while not self.stop_event.is_set():
+            try:
+                if drop:
+                    target_queue.put_nowait(item)
+                else:
+                    target_queue.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                if drop:
+                    # Descartar na hora o frame mais antigo para abrir espaço
+                    try:
+                        dropped = target_queue.get_nowait()
+                        self.dropped_frames += 1
+                        if dropped is not _END:
+                            self._release(dropped[1])
+                    except queue.Empty:
+                        pass
+
+    def _get(self, source_queue):
+        """Retira um item da fila, retornando _END se o pipeline foi parado"""
+        while not self.stop_event.is_set():
+            try:
+                return source_queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _capture_loop(self):
+        """Estágio de captura: lê frames e os envia para processamento"""
+        allocated = False
+        try:
+            while not self.stop_event.is_set() and self.capture.isOpened():
+                captured_at = time.perf_counter()
+                buffer = self._take_buffer()
+                ret, frame = self.capture.read(buffer) if buffer is not None else self.capture.read()
+                if not ret:
+                    break
+                if self.profiler:
+                    self.profiler.record("capture", time.perf_counter() - captured_at)
+                index = int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
+                if not allocated:
+                    # Primeiro frame: alocar de uma vez os demais buffers
+                    for _ in range(self.capture_buffers - 1):
+                        self._release(np.empty_like(frame))
+                    allocated = True
+                self._put(self.capture_queue, (index, frame, captured_at))
+        finally:
+            self._put(self.capture_queue, _END)
+
+    def _process_loop(self):
+        """Estágio de processamento: aplica a operação a cada frame"""
+        try:
+            while True:
+                item = self._get(self.capture_queue)
+                if item is _END:
+                    break
+                index, frame, captured_at = item
+                started = time.perf_counter()
+                processed = self.process_frame(frame)
+                if self.profiler:
+                    self.profiler.record("process", time.perf_counter() - started)
+                # O buffer lido é liberado agora, ou depois de exibido se o
+                # resultado o usa (ex.: cadeia vazia devolve o próprio frame)
+                if np.may_share_memory(processed, frame):
+                    self._put(self.render_queue, (index, processed, captured_at, frame))
+                else:
+                    self._release(frame)
+                    self._put(self.render_queue, (index, processed, captured_at, None))
+        finally:
+            self._put(self.render_queue, _END)
+
+    def run(self, should_continue=lambda: True):
+        """Executa o pipeline até o fim do vídeo, parada ou render_frame retornar False
+
+        A exibição acontece na thread chamadora (necessário para cv2.imshow).
+        Retorna o número de frames exibidos.
+        """
+        workers = [threading.Thread(target=self._capture_loop, daemon=True),
+                   threading.Thread(target=self._process_loop, daemon=True)]
+        for worker in workers:
+            worker.start()
+
+        shown = 0
+        start = time.perf_counter()
+        try:
+            while should_continue():
+                item = self._get(self.render_queue)
+                if item is _END:
+                    break
+                index, frame, captured_at, source = item
+
+                # Cadenciar pelo FPS da fonte descontando o tempo já gasto,
+                # em vez de somar um atraso fixo ao processamento
+                if self.fps:
+                    wait = start + shown / self.fps - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+
+                shown += 1
+                keep_going = self.render_frame(frame, index)
+                if source is not None:
+                    self._release(source)
+                if self.profiler:
+                    self.profiler.frame_done(time.perf_counter() - captured_at)
+                if keep_going is False:
+                    break
+        finally:
+            self.stop()
+            for worker in workers:
+                worker.join()
+
+        return shown
+
+    def stop(self):
+        """Sinaliza a parada de todos os estágios"""
+        self.stop_event.set()
+
+
+# =========================================================================
+# EXPORTAÇÃO PARA ARQUIVO (SEM EXIBIÇÃO, O MAIS RÁPIDO POSSÍVEL)
+# =========================================================================
+
+# Codecs por extensão do arquivo de saída
+_FOURCC_BY_EXTENSION = {
+    ".avi": "MJPG",
+    ".mp4": "mp4v",
+    ".mov": "mp4v",
+    ".mkv": "XVID",
+}
+
+
+def _fourcc_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    return cv2.VideoWriter_fourcc(*_FOURCC_BY_EXTENSION.get(extension, "mp4v"))
+
+
+def render_video_to_file(input_path, output_path, steps, progress=None,
+                         progress_interval=0.5, stop_event=None):
+    """Processa um arquivo de vídeo inteiro e grava o resultado com cv2.VideoWriter
+
+    Não há exibição nem espera pelo FPS da fonte: os frames são lidos,
+    processados e gravados tão rápido quanto a CPU permitir, usando o mesmo
+    pipeline em threads da pré-visualização (sem descarte de frames), com a
+    cadeia de operações steps (nomes de OPERATIONS).
+    progress(frames_gravados, total_de_frames, fps) é chamado a cada
+    progress_interval segundos. Retorna um dicionário com frames, segundos e
+    fps médio.
+    """
+    # Até MAX_FRAMES_IN_FLIGHT frames processados aguardam a gravação ao mesmo
+    # tempo: um buffer de saída para cada
+    chain = ops.make_video_chain(steps, output_buffers=MAX_FRAMES_IN_FLIGHT)
+
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo: {input_path}")
+
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    state = {"writer": None, "frames": 0, "last_report": 0.0}
+    start = time.perf_counter()
+
+    def write_frame(frame, index):
+        # O gravador é criado no primeiro frame, com o formato da saída processada
+        if state["writer"] is None:
+            h, w = frame.shape[:2]
+            state["writer"] = cv2.VideoWriter(output_path, _fourcc_for(output_path),
+                                              source_fps, (w, h), len(frame.shape) == 3)
+            if not state["writer"].isOpened():
+                raise IOError(f"Não foi possível criar o arquivo de saída: {output_path}")
+
+        state["writer"].write(frame)
+        state["frames"] += 1
+
+        now = time.perf_counter()
+        if progress and now - state["last_report"] >= progress_interval:
+            state["last_report"] = now
+            progress(state["frames"], total_frames, state["frames"] / (now - start))
+
+        return stop_event is None or not stop_event.is_set()
+
+    pipeline = VideoPipeline(capture, chain.apply, write_frame, drop_policy=BLOCK)
+    try:
+        pipeline.run()
+    finally:
+        capture.release()
+        if state["writer"] is not None:
+            state["writer"].release()
+
+    elapsed = time.perf_counter() - start
+    fps = state["frames"] / elapsed if elapsed > 0 else 0.0
+    if progress:
+        progress(state["frames"], total_frames, fps)
+
+    return {"frames": state["frames"], "seconds": elapsed, "fps": fps}
+
+
+# =========================================================================
+# PROCESSAMENTO PARALELO POR SEGMENTOS (UM PROCESSO POR INTERVALO DE FRAMES)
+# =========================================================================
+
+def _render_segment(input_path, output_path, steps, start_frame, end_frame):
+    """Processa os frames [start_frame, end_frame) em um processo separado
+
+    Com end_frame None o segmento vai até o fim do arquivo.
+    Cada processo abre sua própria captura, posiciona com CAP_PROP_POS_FRAMES e
+    monta sua própria cadeia de operações, por isso só operações sem estado
+    entre frames podem ser usadas. Retorna o número de frames gravados;
+    lança IOError se o vídeo ou o arquivo do segmento não puderem ser abertos.
+    """
+    cv2.setNumThreads(1)  # O paralelismo vem dos processos
+
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo: {input_path}")
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    chain = ops.make_video_chain(steps)
+    writer = None
+    written = 0
+    frame = None
+    try:
+        while end_frame is None or written < end_frame - start_frame:
+            ret, frame = capture.read(frame)
+            if not ret:
+                break
+            processed = chain.apply(frame)
+            if writer is None:
+                h, w = processed.shape[:2]
+                writer = cv2.VideoWriter(output_path, _fourcc_for(output_path), fps,
+                                         (w, h), len(processed.shape) == 3)
+                if not writer.isOpened():
+                    raise IOError(f"Não foi possível criar o segmento: {output_path}")
+            writer.write(processed)
+            written += 1
+    finally:
+        capture.release()
+        if writer is not None:
+            writer.release()
+
+    return written
+
+
+def _concatenate_segments(ffmpeg, segment_paths, output_path):
+    """Junta os segmentos em ordem no arquivo final com o ffmpeg (cópia direta, sem recodificar)"""
+    list_path = output_path + ".segments.txt"
+    with open(list_path, "w", encoding="utf-8") as list_file:
+        for path in segment_paths:
+            list_file.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                                 "-i", list_path, "-c", "copy", output_path])
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise IOError(f"O ffmpeg não conseguiu juntar os segmentos em: {output_path}")
+
+
+def render_video_parallel(input_path, output_path, steps, workers=None, progress=None,
+                          min_segment_frames=100):
+    """Processa um arquivo de vídeo dividindo-o em intervalos de frames entre processos
+
+    O vídeo é dividido em até 4 segmentos por processo (para equilibrar a carga
+    e permitir relatar o progresso), cada segmento é processado por
+    _render_segment com a cadeia de operações steps (nomes de OPERATIONS) e os
+    resultados são juntados em ordem. progress(frames_prontos, total, fps) é
+    chamado quando cada segmento termina. Retorna o mesmo dicionário que
+    render_video_to_file.
+
+    A junção exige o ffmpeg: sem ele, o vídeo é processado em série por
+    render_video_to_file, já que recodificar os segmentos seria mais lento que
+    a exportação em série e perderia qualidade uma segunda vez.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return render_video_to_file(input_path, output_path, steps, progress=progress)
+
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo: {input_path}")
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    workers = workers or os.cpu_count() or 1
+    segment_count = max(1, min(workers * 4, total_frames // min_segment_frames))
+    bounds = [round(i * total_frames / segment_count) for i in range(segment_count)]
+    # O último segmento vai até o fim real do arquivo (a contagem pode ser imprecisa)
+    bounds.append(None)
+
+    base, extension = os.path.splitext(output_path)
+    segment_paths = [f"{base}.part{i:04d}{extension}" for i in range(segment_count)]
+    start = time.perf_counter()
+    done = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_render_segment, input_path, segment_paths[i], list(steps),
+                                       bounds[i], bounds[i + 1])
+                       for i in range(segment_count)]
+            for future in as_completed(futures):
+                done += future.result()
+                if progress:
+                    progress(done, total_frames, done / (time.perf_counter() - start))
+
+        _concatenate_segments(ffmpeg, [path for path in segment_paths if os.path.exists(path)], output_path)
+    finally:
+        for path in segment_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    elapsed = time.perf_counter() - start
+    return {"frames": done, "seconds": elapsed, "fps": done / elapsed if elapsed > 0 else 0.0}
+
+
+# =========================================================================
+# CICLO DE VIDA DOS LOOPS DE VÍDEO (CANCELAMENTO E CAPTURAS PRÓPRIAS)
+# =========================================================================
+
+class VideoWorker:
+    """Thread de um loop de vídeo, com evento de cancelamento
+
+    target(worker) só começa depois que o worker anterior (se houver)
+    terminou, de forma que os recursos dele (ex.: a câmera) já foram
+    liberados. O loop deve terminar assim que worker.cancelled ficar True.
+    Capturas registradas com own() são liberadas na própria thread ao fim do
+    loop, nunca durante um read().
+    """
+
+    def __init__(self, target, name=None, previous=None):
+        self.target = target
+        self.previous = previous
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._lock = threading.Lock()
+        self._captures = []
+        self._finished = False
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """Pede o fim do loop (não bloqueia)"""
+        self.cancel_event.set()
+
+    def own(self, capture):
+        """Passa a captura para o worker, que a libera ao terminar; retorna a captura"""
+        with self._lock:
+            if not self._finished:
+                self._captures.append(capture)
+                return capture
+        capture.release()  # O loop já terminou: ninguém mais lê dela
+        return capture
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def release_captures(self):
+        """Libera já as capturas registradas com own(); só na thread do loop, depois dele"""
+        with self._lock:
+            self._finished = True
+            captures, self._captures = self._captures, []
+        for capture in captures:
+            capture.release()
+
+    def join(self, timeout=None):
+        """Espera o fim do loop; retorna True se ele terminou"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def _run(self):
+        try:
+            if self.previous is not None:
+                self.previous.join()
+                self.previous = None
+            if not self.cancelled:
+                self.target(self)
+        finally:
+            self.release_captures()
+
+
+class WorkerManager:
+    """Mantém no máximo um loop de vídeo ativo
+
+    start() cancela o loop atual e inicia o novo, que espera o anterior
+    terminar na sua própria thread: quem chama (normalmente a thread do Tk)
+    nunca bloqueia, o que evitaria um impasse com loops que atualizam a
+    interface. release() libera uma captura assim que nenhum loop puder
+    estar lendo dela.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def running(self):
+        """True se há um loop ativo que não foi cancelado"""
+        worker = self._current
+        return worker is not None and worker.is_alive() and not worker.cancelled
+
+    def start(self, target, name=None):
+        """Cancela o loop atual e agenda target(worker) para rodar depois dele"""
+        with self._lock:
+            previous = self._current
+            if previous is not None:
+                previous.cancel()
+                if not previous.is_alive():
+                    previous = None
+            worker = self._current = VideoWorker(target, name, previous)
+        worker.thread.start()
+        return worker
+
+    def stop(self):
+        """Cancela o loop atual (não bloqueia)"""
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+
+    def release(self, capture):
+        """Libera a captura agora, ou ao fim do loop atual se ele ainda estiver rodando"""
+        with self._lock:
+            worker = self._current
+        if worker is not None and worker.is_alive():
+            worker.own(capture)
+        else:
+            capture.release()
+
+    def join(self, timeout=None):
+        """Cancela e espera o loop atual (ex.: ao fechar o programa); retorna True se terminou"""
+        self.stop()
+        worker = self._current
+        return worker is None or worker.join(timeout)